@@ -70,6 +70,7 @@ class ConnectionScreen(ModalScreen):
                 [
                     ("Simulated Data", "simulated"),
                     ("Serial Port", "serial"),
+                    ("Serial Port (in-process)", "serial_direct"),
 
                 ],
                 id="connection_type",
@@ -87,6 +88,9 @@ class ConnectionScreen(ModalScreen):
                         ("38400", "38400"),
                         ("57600", "57600"),
                         ("115200", "115200"),
+                        ("230400", "230400"),
+                        ("460800", "460800"),
+                        ("921600", "921600"),
                     ],
                     id="baudrate",
                     value="9600"
@@ -100,7 +104,7 @@ class ConnectionScreen(ModalScreen):
             self.connection_type = event.value
             # Show/hide serial settings based on selection
             serial_container = self.query_one("#serial_settings")
-            if event.value == "serial":
+            if event.value in ("serial", "serial_direct"):
                 serial_container.remove_class("hidden")
             else:
                 serial_container.add_class("hidden")
@@ -5,25 +5,42 @@ class ConnectionStatus(Static):
         super().__init__()
         self.status = "Disconnected"
         self.connection_info = {}
+        self.status_text = ""
+        self.ingest_text = ""
         self.update_status(None)
-    
+
     def update_status(self, status: str, info: dict = None):
         self.status = status
         self.connection_info = info or {}
-        
+
         if status == "Connected":
             conn_type = self.connection_info.get("type", "Unknown")
             if conn_type == "simulated":
                 details = "Simulated Data"
             elif conn_type == "serial":
                 details = f"Serial: {self.connection_info.get('port', 'N/A')} @ {self.connection_info.get('baudrate', 'N/A')}"
+            elif conn_type == "serial_direct":
+                details = f"Serial (in-process): {self.connection_info.get('port', 'N/A')} @ {self.connection_info.get('baudrate', 'N/A')}"
             elif conn_type == "bluetooth":
                 details = f"Bluetooth: {self.connection_info.get('port', 'N/A')}"
             else:
                 details = "Unknown"
-            
-            self.update(f"[green]● Connected[/green] - {details}")
+
+            self.status_text = f"[green]● Connected[/green] - {details}"
         elif status == "Connecting":
-            self.update(f"[bold yellow]⟳ Connecting...[/bold yellow]")
+            self.status_text = f"[bold yellow]⟳ Connecting...[/bold yellow]"
+        else:
+            self.status_text = f"[bold red]○ Disconnected[/bold red]"
+            self.ingest_text = ""
+        self.refresh_text()
+
+    def update_ingest(self, ingest_stats):
+        """Show how the UI keeps up with the data stream"""
+        self.ingest_text = f"[dim]{ingest_stats.summary()}[/dim]"
+        self.refresh_text()
+
+    def refresh_text(self):
+        if self.ingest_text:
+            self.update(f"{self.status_text}\n{self.ingest_text}")
         else:
-            self.update(f"[bold red]○ Disconnected[/bold red]")
\ No newline at end of file
+            self.update(self.status_text)
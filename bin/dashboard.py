@@ -1,10 +1,15 @@
 from textual.widgets import Static
 
 class Dashboard(Static):
-    def __init__(self):
+    def __init__(self, store):
         super().__init__()
+        self.store = store
         self.update_data(None)
     
+    def draw(self):
+        """Show the latest sample of the TimeSeriesStore"""
+        self.update_data(self.store.latest())
+
     def update_data(self, data):
         if data is None:
             self.update(
@@ -20,14 +25,15 @@ class Dashboard(Static):
                 "Seconds since last reset: -- s\n"
             )
         else:
+            # data is a parsed Sample, missing channels are shown as --
             self.update(
                 "[bold cyan]Dashboard[/bold cyan]\n\n"
-                #f"Error code: {data['Di']}\n"
-                f"Napeti na baterce: {data['Vbat']} V\n"
-                f"Proud do menice motoru: {data['Iout']} A\n"
-                f"Vykon menice motoru: {data['Pout']} W\n"
-                f"Napeti clanku: {data['Vfc']} V\n"
-                f"Vykon clanku: {data['Pfc'] } W\n"
-                f"Teplota clanku: {data['Tfc']} °C\n"
-                f"Seconds since last reset: {data['Tim']} s\n"
+                #f"Error code: {data.get('Di', '--')}\n"
+                f"Napeti na baterce: {data.get('Vbat', '--')} V\n"
+                f"Proud do menice motoru: {data.get('Iout', '--')} A\n"
+                f"Vykon menice motoru: {data.get('Pout', '--')} W\n"
+                f"Napeti clanku: {data.get('Vfc', '--')} V\n"
+                f"Vykon clanku: {data.get('Pfc', '--')} W\n"
+                f"Teplota clanku: {data.get('Tfc', '--')} °C\n"
+                f"Seconds since last reset: {data.get('Tim', '--')} s\n"
             )
\ No newline at end of file
@@ -0,0 +1,147 @@
+import math
+
+# Forecast of when the hydrogen stick and the battery run out, from the
+# trend of the current stint: a straight line fitted to Vfc (and optionally
+# Pfc) for the stick and to Vbat for the battery, extrapolated to the
+# "empty" thresholds of the race config.
+
+MIN_SAMPLES = 30        # no forecast from fewer samples in the stint
+MIN_SPAN = 60.0         # seconds of the stint needed for a forecast
+Z_95 = 1.96             # confidence bounds from the slope standard error
+
+
+class OnlineTrend:
+    """Least squares line y = a + b * t over all samples added, O(1) per sample
+
+    Means and co-moments are updated with Welford's method, which stays
+    accurate over a long stint.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.first_time = None
+        self.last_time = None
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.c_xx = 0.0
+        self.c_xy = 0.0
+        self.c_yy = 0.0
+
+    def add(self, t, y):
+        if self.last_time is not None and t < self.last_time:
+            self.reset()    # time went back (Tim reset), start again
+        if self.first_time is None:
+            self.first_time = t
+        self.last_time = t
+        x = t - self.first_time
+        self.n += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.n
+        dy = y - self.mean_y
+        self.mean_y += dy / self.n
+        self.c_xx += dx * (x - self.mean_x)
+        self.c_xy += dx * (y - self.mean_y)
+        self.c_yy += dy * (y - self.mean_y)
+
+    @property
+    def span(self):
+        return 0.0 if self.first_time is None else self.last_time - self.first_time
+
+    @property
+    def slope(self):
+        """Change of y per second, None without enough spread in time"""
+        return self.c_xy / self.c_xx if self.c_xx > 0 else None
+
+    def slope_error(self):
+        if self.n < 3 or self.c_xx <= 0:
+            return None
+        slope = self.c_xy / self.c_xx
+        residual = max(0.0, self.c_yy - slope * self.c_xy) / (self.n - 2)
+        return math.sqrt(residual / self.c_xx)
+
+    def value_now(self):
+        """Fitted value at the last sample"""
+        return self.mean_y + self.slope * (self.span - self.mean_x)
+
+    def time_to(self, threshold, z=Z_95):
+        """Seconds from the last sample until the line falls to threshold
+
+        Returns (estimate, earliest, latest); latest is None when the slope
+        may be flat within the bounds. None if there is no falling trend yet.
+        """
+        if self.n < MIN_SAMPLES or self.span < MIN_SPAN:
+            return None
+        slope = self.slope
+        error = self.slope_error()
+        if slope is None or error is None or slope >= 0:
+            return None
+        remaining = self.value_now() - threshold
+        if remaining <= 0:
+            return 0.0, 0.0, 0.0
+        estimate = remaining / -slope
+        earliest = remaining / -(slope - z * error)
+        steepest_flat = slope + z * error
+        latest = remaining / -steepest_flat if steepest_flat < 0 else None
+        return estimate, earliest, latest
+
+
+class DepletionForecast:
+    """Trends of the current stick and battery stint and their time to empty"""
+
+    def __init__(self, config):
+        self.stick_trends = {"Vfc": OnlineTrend(), "Pfc": OnlineTrend()}
+        self.battery_trend = OnlineTrend()
+        self.set_config(config)
+
+    def set_config(self, config):
+        self.thresholds = {
+            "Vfc": config.get("stick_empty_vfc", 0),
+            "Pfc": config.get("stick_empty_pfc", 0),
+        }
+        self.battery_threshold = config.get("battery_empty_vbat", 0)
+
+    def reset(self):
+        self.new_stick()
+        self.new_battery()
+
+    def new_stick(self):
+        for trend in self.stick_trends.values():
+            trend.reset()
+
+    def new_battery(self):
+        self.battery_trend.reset()
+
+    def add_sample(self, sample, host_time=None):
+        t = host_time if host_time is not None else sample.get("Tim")
+        if t is None:
+            return
+        for key, trend in self.stick_trends.items():
+            value = sample.get(key)
+            if value is not None and self.thresholds[key] > 0:
+                trend.add(t, value)
+        vbat = sample.get("Vbat")
+        if vbat is not None and self.battery_threshold > 0:
+            self.battery_trend.add(t, vbat)
+
+    def stick_time_left(self):
+        """(estimate, earliest, latest) seconds until the stick is empty, or None
+
+        With both Vfc and Pfc thresholds set the channel running out first wins.
+        """
+        forecasts = [
+            trend.time_to(self.thresholds[key])
+            for key, trend in self.stick_trends.items()
+            if self.thresholds[key] > 0
+        ]
+        forecasts = [f for f in forecasts if f is not None]
+        if not forecasts:
+            return None
+        return min(forecasts, key=lambda f: f[0])
+
+    def battery_time_left(self):
+        if self.battery_threshold <= 0:
+            return None
+        return self.battery_trend.time_to(self.battery_threshold)
@@ -0,0 +1,132 @@
+from bin.telemetryparser import iter_log_lines, parse_line
+
+# Energy from the power channels, integrated with the trapezoidal rule:
+#   fuel cell  Pfc            per hydrogen stick stint
+#   output     Pout           per battery stint
+#   battery    Pout - Pfc     per battery stint, what the battery delivered
+# Samples are timed by host time, or by Tim when a log line has no host time.
+
+MAX_GAP = 5.0       # seconds, longer gaps between samples are not integrated
+
+# App log messages which split the stints when a log is replayed
+RACE_START_MESSAGES = ("Race started", "Race reset")
+STICK_MESSAGE = "Hydrogen stick changed"
+BATTERY_MESSAGE = "Battery changed"
+
+
+class Integrator:
+    """Trapezoidal Wh of one power signal, O(1) per sample
+
+    Intervals longer than max_gap (lost data, disconnect) or going back in
+    time (Tim reset) are skipped; the next sample starts a new segment.
+    """
+
+    def __init__(self, max_gap=MAX_GAP):
+        self.max_gap = max_gap
+        self.wh = 0.0
+        self.seconds = 0.0      # time covered by integrated intervals
+        self.gaps = 0
+        self.last_time = None
+        self.last_power = None
+
+    def add(self, t, power):
+        if self.last_time is not None:
+            dt = t - self.last_time
+            if 0 <= dt <= self.max_gap:
+                self.wh += (power + self.last_power) / 2 * dt / 3600
+                self.seconds += dt
+            else:
+                self.gaps += 1
+        self.last_time = t
+        self.last_power = power
+
+    @property
+    def watts(self):
+        """Average power over the integrated time, None before the first interval"""
+        return self.wh * 3600 / self.seconds if self.seconds > 0 else None
+
+    def split(self):
+        """New integrator for the next stint, continuing from the last sample"""
+        following = Integrator(self.max_gap)
+        following.last_time = self.last_time
+        following.last_power = self.last_power
+        return following
+
+
+class EnergyAccount:
+    """Energy per hydrogen stick stint and per battery stint
+
+    stick_stints holds one Integrator of Pfc per stick, battery_stints one
+    (output, battery) pair per battery; the last entry is the current stint.
+    """
+
+    def __init__(self, max_gap=MAX_GAP):
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        self.stick_stints = [Integrator(self.max_gap)]
+        self.battery_stints = [(Integrator(self.max_gap), Integrator(self.max_gap))]
+
+    def add_sample(self, sample, host_time=None):
+        t = host_time if host_time is not None else sample.get("Tim")
+        if t is None:
+            return
+        pfc = sample.get("Pfc")
+        pout = sample.get("Pout")
+        if pfc is not None:
+            self.stick_stints[-1].add(t, pfc)
+        output, battery = self.battery_stints[-1]
+        if pout is not None:
+            output.add(t, pout)
+            if pfc is not None:
+                battery.add(t, pout - pfc)
+
+    def new_stick(self):
+        self.stick_stints.append(self.stick_stints[-1].split())
+
+    def new_battery(self):
+        output, battery = self.battery_stints[-1]
+        self.battery_stints.append((output.split(), battery.split()))
+
+    @property
+    def stick(self):
+        return self.stick_stints[-1]
+
+    @property
+    def battery(self):
+        """(output, battery) integrators of the current battery stint"""
+        return self.battery_stints[-1]
+
+    def fuel_cell_wh(self):
+        return sum(stint.wh for stint in self.stick_stints)
+
+    def replay_log(self, path):
+        """Rebuild the stints from an app log, returns the number of samples
+
+        Data lines are integrated; the race start/reset, stick change and
+        battery change messages of the app split the stints as they did live.
+        """
+        count = 0
+        for host_time, text in iter_log_lines(path):
+            text = text.strip()
+            if text in RACE_START_MESSAGES:
+                self.reset()
+            elif text == STICK_MESSAGE:
+                self.new_stick()
+            elif text == BATTERY_MESSAGE:
+                self.new_battery()
+            else:
+                try:
+                    sample = parse_line(text)
+                except ValueError:
+                    continue
+                self.add_sample(sample, host_time)
+                count += 1
+        return count
+
+    @classmethod
+    def from_log(cls, path, max_gap=MAX_GAP):
+        account = cls(max_gap)
+        account.replay_log(path)
+        return account
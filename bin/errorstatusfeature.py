@@ -2,8 +2,11 @@ from textual.app import ComposeResult
 from textual.containers import ScrollableContainer, Vertical
 from textual.widgets import Static
 import json
+import operator
+import re
 from pathlib import Path
 import datetime
+from bin.telemetryparser import parse_hex
 
 def load_error_config():
     """Load error configuration from file"""
@@ -35,10 +38,221 @@ def load_error_config():
     
     return default_config
 
+TOKEN = re.compile(r"\s*(?:(-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|(\w+)|(<=|>=|!=|==|<|>)|([&|()]))")
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+def tokenize_expression(expr):
+    """Split 'Vfc < 10 & Vfc > 8' into (kind, text) tokens"""
+    tokens = []
+    pos = 0
+    expr = expr.rstrip()
+    while pos < len(expr):
+        match = TOKEN.match(expr, pos)
+        if not match:
+            raise ValueError(f"Unexpected character at {pos + 1}: {expr[pos:]!r}")
+        number, name, op, punct = match.groups()
+        if number is not None:
+            tokens.append(("number", number))
+        elif name is not None:
+            tokens.append(("name", name))
+        elif op is not None:
+            tokens.append(("op", op))
+        else:
+            tokens.append((punct, punct))
+        pos = match.end()
+    return tokens
+
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class ExpressionCompiler:
+    """Recursive descent parser that turns a condition into nested closures
+
+    Grammar, & binds tighter than |:
+        or_expr    := and_expr ("|" and_expr)*
+        and_expr   := atom ("&" atom)*
+        atom       := "(" or_expr ")" | comparison
+        comparison := operand op operand   (operand is a channel name or a number)
+    A comparison with a missing channel is False.
+    """
+
+    def __init__(self, expr):
+        self.expr = expr
+        self.tokens = tokenize_expression(expr)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self, kind):
+        if self.peek() != kind:
+            found = self.tokens[self.pos][1] if self.pos < len(self.tokens) else "end of condition"
+            raise ValueError(f"Expected {kind}, found {found!r} in {self.expr!r}")
+        self.pos += 1
+        return self.tokens[self.pos - 1][1]
+
+    def compile(self):
+        """Return a function data -> bool, data is a Sample or a dict"""
+        rule = self.or_expr()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.pos][1]!r} in {self.expr!r}")
+        return rule
+
+    def or_expr(self):
+        parts = [self.and_expr()]
+        while self.peek() == "|":
+            self.take("|")
+            parts.append(self.and_expr())
+        if len(parts) == 1:
+            return parts[0]
+        return lambda data: any(part(data) for part in parts)
+
+    def and_expr(self):
+        parts = [self.atom()]
+        while self.peek() == "&":
+            self.take("&")
+            parts.append(self.atom())
+        if len(parts) == 1:
+            return parts[0]
+        return lambda data: all(part(data) for part in parts)
+
+    def atom(self):
+        if self.peek() == "(":
+            self.take("(")
+            inner = self.or_expr()
+            self.take(")")
+            return inner
+        left_name, left_value = self.operand()
+        compare = OPERATORS[self.take("op")]
+        right_name, right_value = self.operand()
+
+        # the common forms get their own closure, one dict lookup per channel
+        if left_name is not None and right_name is None:
+            def comparison(data):
+                value = data.get(left_name)
+                return value is not None and compare(value, right_value)
+        elif left_name is None and right_name is not None:
+            def comparison(data):
+                value = data.get(right_name)
+                return value is not None and compare(left_value, value)
+        elif left_name is not None:
+            def comparison(data):
+                left = data.get(left_name)
+                right = data.get(right_name)
+                return left is not None and right is not None and compare(left, right)
+        else:
+            result = compare(left_value, right_value)
+            def comparison(data):
+                return result
+        return comparison
+
+    def operand(self):
+        """Return (channel name, None) or (None, number)"""
+        if self.peek() == "number":
+            return None, float(self.take("number"))
+        return self.take("name"), None
+
+
+def compile_expression(expr):
+    return ExpressionCompiler(expr).compile()
+
+
+def split_template(template):
+    """'Low ({Vbat}V)' -> ['Low (', 'Vbat', 'V)'], odd items are channel names"""
+    return PLACEHOLDER.split(template)
+
+
+def format_template(parts, data):
+    """Fill a split template, values are shown with 2 decimals, missing ones stay as {name}"""
+    out = [parts[0]]
+    for i in range(1, len(parts), 2):
+        name = parts[i]
+        value = data.get(name)
+        if value is None:
+            out.append(f"{{{name}}}")
+        elif isinstance(value, (int, float)):
+            out.append(f"{value:.2f}")
+        else:
+            try:
+                out.append(f"{float(value):.2f}")
+            except (ValueError, TypeError):
+                out.append(str(value))
+        out.append(parts[i + 1])
+    return "".join(out)
+
+
+def parse_condition_string(condition_str):
+    """Parse condition string like 'warning: Vbat < 8: Message here'"""
+    parts = condition_str.split(":", 2)
+    if len(parts) != 3:
+        return None
+    return {
+        "priority": parts[0].strip(),
+        "expression": parts[1].strip(),
+        "message": parts[2].strip()
+    }
+
+
+def compile_rules(config):
+    """Compile the conditions of the error config, returns (rules, errors)
+
+    A rule is (priority, predicate, message parts, source string).
+    """
+    rules = []
+    errors = []
+    for condition_str in config.get("conditions", []):
+        parsed = parse_condition_string(condition_str)
+        if not parsed:
+            errors.append(f"Not 'priority: condition: message': {condition_str!r}")
+            continue
+        try:
+            predicate = compile_expression(parsed["expression"])
+        except ValueError as e:
+            errors.append(str(e))
+            continue
+        rules.append((parsed["priority"], predicate, split_template(parsed["message"]), condition_str))
+    return rules, errors
+
+
+def parse_error_code(code):
+    """Configured error code to int: "0x1a" and bare hex digits like "b" are hex, "10" and 10 decimal"""
+    if isinstance(code, int):
+        return code
+    code = str(code).strip()
+    if code.isdigit():
+        return int(code)
+    return parse_hex(code)
+
+
+def build_error_index(config):
+    """Map parsed error code -> error entry, the first entry listing a code wins"""
+    index = {}
+    for error in config.get("error_codes", []):
+        for code in error["code"]:
+            try:
+                index.setdefault(parse_error_code(code), error)
+            except ValueError:
+                continue
+    return index
+
+
 class ErrorStatus(Static):
     def __init__(self):
         super().__init__()
-        self.config = load_error_config()
+        self.status_text = ""
+        self.loss_text = ""
+        self.nodata = None
+        self.clear_frame()
+        self.load_config()
         
     def compose(self) -> ComposeResult:
         with Vertical():
@@ -46,131 +260,35 @@ class ErrorStatus(Static):
             with ScrollableContainer(id="error_scroll"):
                 yield Static(id="error_list")
     
+    def load_config(self):
+        """Load the config and compile conditions and error codes once"""
+        self.config = load_error_config()
+        self.rules, self.rule_errors = compile_rules(self.config)
+        self.error_index = build_error_index(self.config)
+
     def reload_config(self):
         """Reload error codes from config"""
-        self.config = load_error_config()
+        self.load_config()
     
     def find_error_info(self, err_code):
-        """Find error information from config"""
-        for error in self.config.get("error_codes", []):
-            if err_code in error["code"]:
-                return error
-        return None
-    
-    def parse_condition_string(self, condition_str):
-        """Parse condition string like 'warning: Vbat < 8: Message here'"""
-        try:
-            parts = condition_str.split(":", 2)
-            if len(parts) != 3:
-                return None
-            
-            priority = parts[0].strip()
-            condition_expr = parts[1].strip()
-            message_template = parts[2].strip()
-            
-            return {
-                "priority": priority,
-                "expression": condition_expr,
-                "message": message_template
-            }
-        except Exception:
-            return None
-    
-    def evaluate_expression(self, expr, data):
-        """Evaluate a condition expression like 'Vbat < 8' or 'Vfc < 10 & Vfc > 8'"""
-        try:
-            # Split by & (AND) or | (OR)
-            if " & " in expr:
-                conditions = expr.split(" & ")
-                operator = "and"
-            elif " | " in expr:
-                conditions = expr.split(" | ")
-                operator = "or"
-            else:
-                conditions = [expr]
-                operator = "single"
-            
-            results = []
-            for condition in conditions:
-                condition = condition.strip()
-                
-                # Parse single condition
-                for op in ["<=", ">=", "!=", "==", "<", ">"]:
-                    if op in condition:
-                        var, threshold = condition.split(op)
-                        var = var.strip()
-                        threshold = float(threshold.strip())
-                        
-                        if var not in data:
-                            return False
-                        
-                        try:
-                            value = float(data[var])
-                        except (ValueError, TypeError):
-                            return False
-                        
-                        # Evaluate
-                        if op == "<":
-                            results.append(value < threshold)
-                        elif op == ">":
-                            results.append(value > threshold)
-                        elif op == "<=":
-                            results.append(value <= threshold)
-                        elif op == ">=":
-                            results.append(value >= threshold)
-                        elif op == "==":
-                            results.append(value == threshold)
-                        elif op == "!=":
-                            results.append(value != threshold)
-                        break
-            
-            # Combine results
-            if operator == "and":
-                return all(results)
-            elif operator == "or":
-                return any(results)
-            else:
-                return results[0] if results else False
-                
-        except Exception:
-            return False
-    
-    def format_message(self, template, data):
-        """Replace {variable} placeholders in message with actual values"""
-        try:
-            import re
-            variables = re.findall(r'\{(\w+)\}', template)
-            
-            message = template
-            for var in variables:
-                if var in data:
-                    try:
-                        value = float(data[var])
-                        message = message.replace(f"{{{var}}}", f"{value:.2f}")
-                    except (ValueError, TypeError):
-                        message = message.replace(f"{{{var}}}", str(data[var]))
-            
-            return message
-        except Exception:
-            return template
+        """Find error information from config, err_code is the parsed Di value (int)"""
+        return self.error_index.get(err_code)
     
     def check_conditions(self, data):
         """Check all condition-based alerts"""
         alerts = []
         
-        for condition_str in self.config.get("conditions", []):
-            parsed = self.parse_condition_string(condition_str)
-            if not parsed:
-                continue
-            
-            if self.evaluate_expression(parsed["expression"], data):
-                message = self.format_message(parsed["message"], data)
-                alert = {
-                    "priority": parsed["priority"],
-                    "message": message,
+        for priority, predicate, message_parts, _ in self.rules:
+            try:
+                matched = predicate(data)
+            except TypeError:
+                matched = False
+            if matched:
+                alerts.append({
+                    "priority": priority,
+                    "message": format_template(message_parts, data),
                     "type": "condition"
-                }
-                alerts.append(alert)
+                })
         
         return alerts
     
@@ -194,31 +312,86 @@ class ErrorStatus(Static):
         }
         return priority_values.get(priority, 0)
     
+    def clear_frame(self):
+        """Forget the samples collected since the last draw"""
+        self.frame_samples = 0
+        self.frame_code = None
+        self.frame_severity = -1
+        self.frame_alerts = {}    # rule index -> alert, from the latest sample that raised it
+
+    def code_severity(self, err_code):
+        error_info = self.find_error_info(err_code)
+        if error_info:
+            return self.get_priority_value(error_info["priority"])
+        return 0 if err_code == 0 else self.get_priority_value("critical")
+
+    def add_sample(self, data):
+        """Check one sample without redrawing
+
+        Until the next draw() the most severe error code and every alert raised
+        by any of the samples are kept, so a short alert between two frames is
+        still shown.
+        """
+        self.nodata = None
+        err_code = data.get('Di')
+        severity = self.code_severity(err_code)
+        if severity >= self.frame_severity:
+            self.frame_code = err_code
+            self.frame_severity = severity
+        self.frame_samples += 1
+
+        for index, (priority, predicate, message_parts, _) in enumerate(self.rules):
+            try:
+                matched = predicate(data)
+            except TypeError:
+                matched = False
+            if matched:
+                self.frame_alerts[index] = {
+                    "priority": priority,
+                    "message": format_template(message_parts, data),
+                    "type": "condition"
+                }
+
+    def set_nodata(self, nodata):
+        self.clear_frame()
+        self.nodata = nodata
+
     def update_status(self, data, nodata):
+        """Check the sample and redraw"""
         if data is None:
-            error_list = self.query_one("#error_list", Static)
-            error_list.update(f"[dim]No data received ({nodata} cycles)[/dim]")
+            self.set_nodata(nodata)
+        else:
+            self.add_sample(data)
+        self.draw()
+
+    def draw(self):
+        if self.nodata is not None:
+            self.status_text = f"[dim]No data received ({self.nodata} cycles)[/dim]"
+            self.refresh_text()
+            return
+        if self.frame_samples == 0:
             return
         
         display_parts = []
         
         # ALWAYS show error code first
-        err_code = data.get('Di', 'unknown')
+        err_code = self.frame_code
         error_info = self.find_error_info(err_code)
         
         if error_info:
             color, symbol = self.get_priority_style(error_info["priority"])
             display_parts.append(f"[bold]Error Code:[/bold] [{color}]{symbol} {error_info['message']}[/{color}]")
-        elif err_code not in ["0x0", "0"]:
+        elif err_code != 0:
             color, symbol = self.get_priority_style("critical")
-            display_parts.append(f"[bold]Error Code:[/bold] [{color}]{symbol} Unknown error code: {err_code}[/{color}]")
+            display_parts.append(f"[bold]Error Code:[/bold] [{color}]{symbol} Unknown error code: {'unknown' if err_code is None else hex(err_code)}[/{color}]")
         else:
             color, symbol = self.get_priority_style("info")
             display_parts.append(f"[bold]Error Code:[/bold] [{color}]{symbol} OK - System operational[/{color}]")
         
-        # Check conditions and sort by priority
-        condition_alerts = self.check_conditions(data)
+        # Alerts in config order, sorted by priority
+        condition_alerts = [self.frame_alerts[index] for index in sorted(self.frame_alerts)]
         condition_alerts.sort(key=lambda x: self.get_priority_value(x["priority"]), reverse=True)
+        self.clear_frame()
         
         # Show condition alerts if any
         if condition_alerts:
@@ -227,5 +400,53 @@ class ErrorStatus(Static):
                 color, symbol = self.get_priority_style(alert["priority"])
                 display_parts.append(f"[{color}]{symbol} {alert['message']}[/{color}]")
         
+        self.status_text = "\n".join(display_parts)
+        self.refresh_text()
+
+    def update_loss(self, dropped, coalesced):
+        """Warn when the ingest queue overflows and samples are lost or not shown"""
+        if dropped:
+            loss_text = f"[yellow]Data loss: {dropped} lines dropped, {coalesced} not shown[/yellow]"
+        elif coalesced:
+            loss_text = f"[yellow]Falling behind: {coalesced} lines logged but not shown[/yellow]"
+        else:
+            loss_text = ""
+        if loss_text != self.loss_text:
+            self.loss_text = loss_text
+            self.refresh_text()
+
+    def refresh_text(self):
         error_list = self.query_one("#error_list", Static)
-        error_list.update("\n".join(display_parts))
\ No newline at end of file
+        if self.loss_text:
+            error_list.update(f"{self.status_text}\n{self.loss_text}")
+        else:
+            error_list.update(self.status_text)
+
+
+if __name__ == "__main__":
+    # Per-sample cost of the error code lookup and the condition checks
+    import random
+    import time
+    from bin.telemetryparser import parse_line
+
+    samples = [parse_line(
+        f"Tim:{t} Di:{hex(random.choice([0, 1, 3, 8, 9, 11, 12]))} Pwm:0 "
+        f"Vbat:{random.uniform(7, 11):.2f} Iout:{random.uniform(10, 20):.2f} "
+        f"Pout:{random.uniform(35, 60):.2f} Vfc:{random.uniform(7, 11):.2f} "
+        f"Pfc:{random.uniform(35, 60):.2f} PfcDes:{random.uniform(35, 60):.2f} "
+        f"Tfc:{random.randint(-5, 80)}"
+    ) for t in range(50000)]
+
+    index = build_error_index({"error_codes": [{"code": ["10"]}, {"code": ["0x10"]}, {"code": ["b", 12]}]})
+    assert sorted(index) == [10, 11, 12, 16], sorted(index)
+    assert index[10]["code"] == ["10"] and index[16]["code"] == ["0x10"]
+
+    status = ErrorStatus()
+
+    for name, func in (("find_error_info", lambda s: status.find_error_info(s.Di)),
+                       ("check_conditions", status.check_conditions)):
+        start = time.perf_counter()
+        for sample in samples:
+            func(sample)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<20} {elapsed / len(samples) * 1e6:6.2f} us/sample")
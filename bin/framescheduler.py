@@ -0,0 +1,44 @@
+class FrameScheduler:
+    """Redraws widgets at most fps times per second
+
+    Widgets keep their latest state and the app marks them dirty with
+    mark(draw), where draw is the method that rebuilds the widget text.
+    Every frame the dirty draw methods are called once, however many
+    samples arrived in between. fps 0 draws immediately on every mark.
+    """
+
+    def __init__(self, fps=10):
+        self.fps = fps
+        self.dirty = {}       # draw method -> None, dict keeps the marking order
+        self.timer = None
+        self.frames = 0
+        self.draws = 0
+        self.marks = 0
+
+    def start(self, app):
+        """Start the frame timer on the app"""
+        if self.fps > 0 and self.timer is None:
+            self.timer = app.set_interval(1 / self.fps, self.draw_frame)
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+
+    def mark(self, draw):
+        self.marks += 1
+        if self.timer is None:
+            self.draws += 1
+            draw()
+        else:
+            self.dirty[draw] = None
+
+    def draw_frame(self):
+        if not self.dirty:
+            return
+        dirty = self.dirty
+        self.dirty = {}
+        self.frames += 1
+        for draw in dirty:
+            self.draws += 1
+            draw()
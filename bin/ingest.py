@@ -0,0 +1,115 @@
+import time
+import threading
+from collections import deque
+from queue import Empty
+
+QUEUE_POLICIES = ("drop-oldest", "drop-newest", "coalesce")
+
+class IngestQueue:
+    """Bounded queue between the reader thread and the UI
+
+    When the queue is full the policy decides what happens to the new line:
+    - drop-oldest: the oldest waiting line is thrown away
+    - drop-newest: the new line is thrown away
+    - coalesce: the oldest waiting line skips the display and is passed to on_spill
+      (written to the session log), so only the latest lines get shown
+    """
+
+    def __init__(self, maxsize=10000, policy="coalesce", on_spill=None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_spill = on_spill
+        self.items = deque()
+        self.lock = threading.Lock()
+        self.dropped = 0
+        self.coalesced = 0
+
+    def put(self, item):
+        """Add item, returns False if the item itself was dropped"""
+        spilled = None
+        with self.lock:
+            if len(self.items) >= self.maxsize:
+                if self.policy == "drop-newest":
+                    self.dropped += 1
+                    return False
+                oldest = self.items.popleft()
+                if self.policy == "coalesce":
+                    self.coalesced += 1
+                    spilled = oldest
+                else:
+                    self.dropped += 1
+            self.items.append(item)
+
+        if spilled is not None and self.on_spill:
+            self.on_spill(spilled)
+        return True
+
+    def get_nowait(self):
+        with self.lock:
+            if not self.items:
+                raise Empty
+            return self.items.popleft()
+
+    def qsize(self):
+        return len(self.items)
+
+    def empty(self):
+        return not self.items
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def reset_counters(self):
+        self.dropped = 0
+        self.coalesced = 0
+
+class IngestStats:
+    """Counters showing how well the UI keeps up with the incoming lines"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.batch_lines = 0      # lines handled by the last drain
+        self.total_lines = 0
+        self.backlog = 0          # lines still waiting after the last drain
+        self.oldest_age = 0.0     # seconds the oldest line of the last drain waited in the queue
+        self.info_lines = 0
+        self.parse_errors = 0
+        self.dropped = 0          # lines lost because the queue was full
+        self.coalesced = 0        # lines written to the log without being displayed
+        self.lines_per_sec = 0.0
+        self.rate_start = time.monotonic()
+        self.rate_count = 0
+
+    def record_batch(self, handled, backlog, oldest_age, queue=None):
+        """Store the result of one drain and update the lines/s rate"""
+        if queue is not None:
+            self.dropped = queue.dropped
+            self.coalesced = queue.coalesced
+        self.batch_lines = handled
+        self.total_lines += handled
+        self.backlog = backlog
+        self.oldest_age = oldest_age
+
+        self.rate_count += handled
+        now = time.monotonic()
+        elapsed = now - self.rate_start
+        if elapsed >= 1:
+            self.lines_per_sec = self.rate_count / elapsed
+            self.rate_start = now
+            self.rate_count = 0
+
+    def summary(self):
+        text = (
+            f"{self.lines_per_sec:.0f} lines/s | "
+            f"batch: {self.batch_lines} | "
+            f"backlog: {self.backlog} | "
+            f"age: {self.oldest_age * 1000:.0f} ms"
+        )
+        if self.dropped or self.coalesced:
+            text += f" | dropped: {self.dropped} | not shown: {self.coalesced}"
+        return text
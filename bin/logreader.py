@@ -0,0 +1,272 @@
+import os
+import re
+from datetime import datetime, timedelta
+import numpy as np
+
+from bin.telemetryparser import BRACKET_TIME, CHANNELS, CHANNEL_NAMES, parse_line, strip_log_prefix
+
+# Reads whole text logs into a float array (rows x channels) for plotting.
+# The file is read in large blocks; every line of a block is matched by one
+# regex pass, the regular telemetry lines are converted with numpy and only
+# the other lines (reordered channels, app log messages, headers) go through
+# the schema parser. Results are cached in a sidecar .npz next to the log.
+# The last column is the host time of "[2024-05-01 12:00:01] ..." lines
+# (serialcomfeature2.py --timestamp-lines), NaN without one, as a unix
+# timestamp of the local time like telemetryparser.iter_log_lines.
+
+BLOCK_SIZE = 8 * 1024 * 1024     # bytes read per block
+CACHE_VERSION = 3
+
+HOST_TIME = "host_time"
+LOG_COLUMNS = CHANNEL_NAMES + (HOST_TIME,)
+
+# Every line: either a regular line, all channels in schema order after an
+# optional bracket timestamp and any prefix (app log line numbers), or
+# anything else, captured whole in the last group. Values are at most
+# TOKEN_SIZE bytes.
+TOKEN_SIZE = 32
+BLOCK_LINE = re.compile(
+    rb"(?m)^(?:[^\n]*?(?:\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\] *)?"
+    + rb" +".join(rb"%s:(\S{1,%d})" % (name.encode(), TOKEN_SIZE) for name in CHANNEL_NAMES)
+    + rb"[^\n]*|([^\n]*))$"
+)
+
+HEX_COLUMNS = [i for i, (_, kind, _) in enumerate(CHANNELS) if kind == "hex"]
+INT_COLUMNS = [i for i, (_, kind, _) in enumerate(CHANNELS) if kind == "int"]
+NUMBER_COLUMNS = [i for i, (_, kind, _) in enumerate(CHANNELS) if kind != "hex"]
+
+
+def cache_path(path):
+    return os.path.splitext(path)[0] + ".npz"
+
+
+def parse_host_times(stamps):
+    """Array of local b"2024-05-01 12:00:01" (or b"") to unix timestamps, NaN where empty"""
+    stamps = np.asarray(stamps, dtype="S19")
+    seconds = np.full(len(stamps), np.nan)
+    present = stamps != b""
+    if present.any():
+        iso = np.char.replace(stamps[present], b" ", b"T").astype("U19")
+        naive = iso.astype("datetime64[s]").astype(np.int64)
+        # UTC offset once per hour of local time, DST changes on whole hours
+        hours, inverse = np.unique(naive // 3600, return_inverse=True)
+        epoch = datetime(1970, 1, 1)
+        shifts = np.array([(epoch + timedelta(hours=int(hour))).timestamp() - int(hour) * 3600 for hour in hours])
+        seconds[present] = naive + shifts[inverse.reshape(-1)]
+    return seconds
+
+
+def parse_block_fast(block):
+    """Parse a block, regular lines with numpy and the others one by one
+
+    Returns None if a regular line has a bad value, then the whole block
+    needs the slow path.
+    """
+    matches = BLOCK_LINE.findall(block)
+    if not matches:
+        return np.empty((0, len(LOG_COLUMNS)))
+
+    tokens = np.array(matches, dtype=f"S{TOKEN_SIZE}")
+    regular = tokens[:, 1] != b""
+    if not regular.all():
+        values = np.full((len(tokens), len(LOG_COLUMNS)), np.nan)
+        keep = regular.copy()
+        for i in np.flatnonzero(~regular):
+            line = matches[i][-1]
+            if not line.strip() or line.startswith(b"---"):
+                continue
+            row = parse_block_slow(line)
+            if len(row):
+                values[i] = row[0]
+                keep[i] = True
+        if regular.any():
+            fast = convert_tokens(tokens[regular])
+            if fast is None:
+                return None
+            values[regular] = fast
+        return values[keep]
+    return convert_tokens(tokens)
+
+
+def convert_tokens(tokens):
+    """Values of regular lines from their match groups, None on a bad value"""
+    stamps, tokens = tokens[:, 0], tokens[:, 1:-1]
+    values = np.empty((len(tokens), len(LOG_COLUMNS)))
+    try:
+        values[:, NUMBER_COLUMNS] = tokens[:, NUMBER_COLUMNS].astype(float)
+        for i in HEX_COLUMNS:
+            # few distinct codes, convert each once
+            unique, inverse = np.unique(tokens[:, i], return_inverse=True)
+            codes = np.array([int(code, 16) for code in unique], dtype=float)
+            values[:, i] = codes[inverse.reshape(-1)]
+        values[:, -1] = parse_host_times(stamps)
+    except ValueError:
+        return None
+    if INT_COLUMNS:
+        values[:, INT_COLUMNS] = np.trunc(values[:, INT_COLUMNS])
+    return values
+
+
+def parse_block_slow(block):
+    """Line by line parse, for reordered channels, missing channels and bad values"""
+    rows = []
+    stamps = []
+    for line in block.decode("utf-8", errors="ignore").splitlines():
+        if line.startswith("---"):
+            continue
+        match = BRACKET_TIME.match(line)
+        if match:
+            line = line[match.end():]
+        try:
+            sample = parse_line(strip_log_prefix(line))
+        except ValueError:
+            continue
+        rows.append([np.nan if value is None else value for value in sample] + [np.nan])
+        stamps.append(match.group(1) if match else "")
+    values = np.array(rows, dtype=float).reshape(-1, len(LOG_COLUMNS))
+    values[:, -1] = parse_host_times(np.array(stamps, dtype="S19"))
+    return values
+
+
+def iter_blocks(path, block_size=BLOCK_SIZE):
+    """Yield blocks of complete lines"""
+    with open(path, "rb") as f:
+        carry = b""
+        while True:
+            chunk = f.read(block_size)
+            if not chunk:
+                break
+            data = carry + chunk
+            end = data.rfind(b"\n") + 1
+            if end == 0:
+                carry = data
+                continue
+            carry = data[end:]
+            yield data[:end]
+        if carry:
+            yield carry
+
+
+def parse_log_array(path, block_size=BLOCK_SIZE):
+    """Parse a raw or app log into a float array with the LOG_COLUMNS, NaN if missing"""
+    # Preallocate from the file size, grow if the estimate was too small
+    capacity = max(1024, os.path.getsize(path) // 80)
+    data = np.empty((capacity, len(LOG_COLUMNS)))
+    rows = 0
+    for block in iter_blocks(path, block_size):
+        values = parse_block_fast(block)
+        if values is None:
+            values = parse_block_slow(block)
+        if rows + len(values) > capacity:
+            capacity = max(capacity * 2, rows + len(values))
+            grown = np.empty((capacity, len(LOG_COLUMNS)))
+            grown[:rows] = data[:rows]
+            data = grown
+        data[rows:rows + len(values)] = values
+        rows += len(values)
+    return data[:rows].copy()
+
+
+def load_log_array(path, use_cache=True):
+    """parse_log_array with a sidecar .npz cache, keyed on file size and mtime"""
+    stat = os.stat(path)
+    key = np.array([CACHE_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    npz_path = cache_path(path)
+
+    if use_cache and os.path.exists(npz_path):
+        try:
+            with np.load(npz_path) as cached:
+                if np.array_equal(cached["key"], key) and tuple(cached["channels"]) == LOG_COLUMNS:
+                    return cached["data"]
+        except Exception:
+            pass  # unreadable or old cache, parse again
+
+    data = parse_log_array(path)
+    if use_cache:
+        tmp_path = npz_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, key=key, channels=np.array(LOG_COLUMNS), data=data)
+            os.replace(tmp_path, npz_path)
+        except OSError:
+            pass  # read-only log directory, just don't cache
+    return data
+
+
+class LogFollower:
+    """Parses the lines appended to a growing log since the last poll()
+
+    Rows go into one float array that doubles its capacity when full, so
+    every poll only parses the new bytes and copies nothing else.
+    """
+
+    host_column = HOST_TIME
+
+    def __init__(self, path, capacity=65536):
+        self.path = path
+        self.offset = 0
+        self.carry = b""
+        self.data = np.empty((capacity, len(LOG_COLUMNS)))
+        self.rows = 0
+
+    def poll(self):
+        """Parse the complete lines appended since the last call, returns how many rows were added"""
+        size = os.path.getsize(self.path)
+        if size < self.offset:
+            # truncated or replaced, start again
+            self.offset = 0
+            self.carry = b""
+            self.rows = 0
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        self.offset += len(chunk)
+        data = self.carry + chunk
+        end = data.rfind(b"\n") + 1
+        self.carry = data[end:]
+        if end == 0:
+            return 0
+        values = parse_block_fast(data[:end])
+        if values is None:
+            values = parse_block_slow(data[:end])
+        self.append(values)
+        return len(values)
+
+    def append(self, values):
+        needed = self.rows + len(values)
+        if needed > len(self.data):
+            grown = np.empty((max(needed, 2 * len(self.data)), len(LOG_COLUMNS)))
+            grown[:self.rows] = self.data[:self.rows]
+            self.data = grown
+        self.data[self.rows:needed] = values
+        self.rows = needed
+
+    def column(self, name, last=None):
+        """View of one channel (or HOST_TIME), only the last rows if given"""
+        start = 0 if last is None else max(0, self.rows - last)
+        return self.data[start:self.rows, LOG_COLUMNS.index(name)]
+
+
+if __name__ == "__main__":
+    # Timing against the line by line parser
+    import sys
+    import time
+
+    for log_path in sys.argv[1:]:
+        start = time.perf_counter()
+        with open(log_path, "rb") as f:
+            slow = parse_block_slow(f.read())
+        t_slow = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast = parse_log_array(log_path)
+        t_fast = time.perf_counter() - start
+
+        load_log_array(log_path)
+        start = time.perf_counter()
+        load_log_array(log_path)
+        t_cached = time.perf_counter() - start
+
+        same = slow.shape == fast.shape and np.allclose(slow, fast, equal_nan=True)
+        print(f"{log_path}: {len(fast)} rows, line by line {t_slow:.2f}s, "
+              f"blocks {t_fast:.2f}s, cached {t_cached:.2f}s, same={same}")
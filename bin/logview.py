@@ -0,0 +1,150 @@
+from array import array
+from rich.text import Text
+from textual.widgets import RichLog
+
+READ_SIZE = 1024 * 1024     # bytes read at once when indexing the log file
+
+
+class LogIndex:
+    """Byte offsets of the lines in a log file, extended as the file grows
+
+    Only complete lines (ending with a newline) are indexed, so a line the
+    writer thread is still writing is picked up by the next update().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = array("q")
+        self.indexed = 0    # byte offset after the last indexed line
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def update(self):
+        """Index the lines appended since the last call"""
+        with open(self.path, "rb") as f:
+            f.seek(self.indexed)
+            pos = self.indexed
+            line_start = self.indexed
+            while True:
+                block = f.read(READ_SIZE)
+                if not block:
+                    break
+                end = block.find(b"\n")
+                while end >= 0:
+                    self.offsets.append(line_start)
+                    line_start = pos + end + 1
+                    end = block.find(b"\n", end + 1)
+                pos += len(block)
+        self.indexed = line_start
+        return len(self.offsets)
+
+    def read(self, first, count):
+        """Return lines first .. first + count - 1 without the newline"""
+        first = max(0, first)
+        last = min(len(self.offsets), first + count)
+        if first >= last:
+            return []
+        end = self.offsets[last] if last < len(self.offsets) else self.indexed
+        with open(self.path, "rb") as f:
+            f.seek(self.offsets[first])
+            data = f.read(end - self.offsets[first])
+        return data.decode("utf-8", errors="replace").splitlines()
+
+
+class SessionLogView(RichLog):
+    """Data log that keeps only the last max_lines lines in memory
+
+    While following, new lines are written as they come, data lines only
+    every show_every-th one (info lines and messages always). Page up at
+    the top loads older lines from the session log file through a LogIndex,
+    page down at the bottom moves forward again and returns to following
+    at the end of the file. End returns to following directly.
+    """
+
+    def __init__(self, path=None, flush=None, max_lines=1000, show_every=1, **kwargs):
+        super().__init__(max_lines=max_lines, **kwargs)
+        self.window = max_lines
+        self.show_every = max(1, show_every)
+        self.flush = flush
+        self.index = None
+        self.first = None    # first file line shown while paging, None while following
+        self.data_lines = 0
+        self.set_path(path)
+
+    def set_path(self, path):
+        self.index = LogIndex(path) if path else None
+
+    @property
+    def following(self):
+        return self.first is None
+
+    def add_line(self, line, sample=False):
+        """Show a new line, sample marks data lines which may be skipped"""
+        if sample:
+            self.data_lines += 1
+            if self.data_lines % self.show_every:
+                return
+        if self.following:
+            self.write(line)
+
+    def load_page(self, first):
+        """Show window lines of the file starting at first, returns False without a file"""
+        if self.index is None:
+            return False
+        if self.flush:
+            self.flush()
+        total = self.index.update()
+        first = max(0, min(first, total - self.window))
+        self.first = first
+        self.auto_scroll = False
+        self.clear()
+        for line in self.index.read(first, self.window):
+            self.write(Text(line), scroll_end=False)
+        return True
+
+    def follow(self):
+        """Show the end of the file and the new lines again"""
+        if self.following:
+            return
+        self.first = None
+        self.auto_scroll = True
+        self.clear()
+        total = self.index.update()
+        for line in self.index.read(total - self.window, self.window):
+            self.write(Text(line))
+        self.scroll_end(animate=False)
+
+    def action_page_up(self):
+        if self.scroll_y > 0 or self.index is None:
+            return super().action_page_up()
+        if self.following:
+            shown = len(self.lines)
+            self.load_page(self.index.update() - self.window)
+            # Continue above the oldest line that was in memory
+            top = len(self.index) - shown
+            self.scroll_to(y=max(0, top - self.first - self.size.height), animate=False)
+            return
+        if self.first == 0:
+            return
+        step = self.window // 2
+        first = max(0, self.first - step)
+        shift = self.first - first
+        self.load_page(first)
+        self.scroll_to(y=shift, animate=False)
+
+    def action_page_down(self):
+        if self.following or self.scroll_y < self.max_scroll_y:
+            return super().action_page_down()
+        old_first = self.first
+        if old_first + self.window >= self.index.update():
+            self.follow()
+            return
+        self.load_page(old_first + self.window // 2)
+        # Keep the lines that were at the bottom of the view where they were
+        bottom = old_first + self.window - self.size.height
+        self.scroll_to(y=max(0, bottom - self.first), animate=False)
+
+    def action_scroll_end(self):
+        self.follow()
+        super().action_scroll_end()
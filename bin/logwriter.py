@@ -0,0 +1,213 @@
+import _thread
+import atexit
+import datetime
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+FSYNC_POLICIES = ("none", "second", "batch")
+STOP_LINE = "stop"      # sent by the app on the stdin of an acquisition script
+
+DEFAULT_LOG_CONFIG = {
+    "log_buffer_lines": 10000,
+    "log_flush_lines": 500,
+    "log_flush_interval": 0.5,
+    "log_fsync": "second"
+}
+
+
+def create_log_file(prefix="rawdatalog"):
+    """Create a unique log file for each session."""
+    os.makedirs("./logs", exist_ok=True)
+    date_str = datetime.datetime.now().strftime("%Y%m%d")
+    k = 0
+    while True:
+        path = f"./logs/{prefix}{date_str}_{k}.txt"
+        if not os.path.exists(path):
+            with open(path, "w") as f:
+                f.write(f"--- New session started at {datetime.datetime.now():%Y-%m-%d %H:%M:%S} ---\n")
+            return path
+        k += 1
+
+
+def open_log_writer(path, config=None):
+    """Create a LogWriter using the log_* settings of the app config"""
+    if config is None:
+        config = {}
+        try:
+            with open(Path("config/app_config.json"), 'r') as f:
+                config = json.load(f)
+        except Exception:
+            pass
+    config = {**DEFAULT_LOG_CONFIG, **config}
+    return LogWriter(
+        path,
+        max_lines=config["log_buffer_lines"],
+        flush_lines=config["log_flush_lines"],
+        flush_interval=config["log_flush_interval"],
+        fsync=config["log_fsync"],
+    )
+
+
+def stop_on_request():
+    """Raise KeyboardInterrupt in the main thread when a stop line arrives on stdin
+
+    The app stops the acquisition scripts this way, so they flush their log
+    on every platform (terminate() is TerminateProcess on Windows). The end
+    of stdin alone does not stop, the scripts also run with stdin redirected.
+    """
+    def watch():
+        for line in sys.stdin:
+            if line.strip() == STOP_LINE:
+                _thread.interrupt_main()
+                return
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def stop_process(process, timeout=2.0):
+    """Stop a script started with stdin=PIPE: a stop line first, terminate and kill only if it hangs"""
+    try:
+        process.stdin.write(STOP_LINE + "\n")
+        process.stdin.close()
+    except (OSError, ValueError):
+        pass    # already exited
+    for escalate in (None, process.terminate, process.kill):
+        if escalate:
+            escalate()
+        try:
+            process.wait(timeout=timeout)
+            return
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class TimestampCache:
+    """Formats the current time once per second instead of once per line"""
+
+    def __init__(self, fmt="%H:%M:%S"):
+        self.fmt = fmt
+        self.second = None
+        self.text = ""
+
+    def now(self):
+        second = int(time.time())
+        if second != self.second:
+            self.second = second
+            self.text = datetime.datetime.fromtimestamp(second).strftime(self.fmt)
+        return self.text
+
+
+class LogWriter:
+    """Appends lines to a log file from a dedicated writer thread
+
+    Lines are collected in a bounded buffer and written when flush_lines are
+    waiting or flush_interval has passed. If the buffer is full write() waits
+    for the writer thread, so no line is lost. fsync policy:
+    - none: leave it to the OS
+    - second: fsync at most once per second
+    - batch: fsync after every write
+    """
+
+    def __init__(self, path, max_lines=10000, flush_lines=500, flush_interval=0.5, fsync="second"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = path
+        self.max_lines = max_lines
+        self.flush_lines = flush_lines
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.file = open(path, "a", encoding="utf-8")
+        self.buffer = []
+        self.cond = threading.Condition()
+        self.closed = False
+        self.flush_requested = 0    # incremented by flush(), the writer copies it when done
+        self.flush_done = 0
+        self.lines_written = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    @property
+    def backlog(self):
+        """Number of lines waiting to be written"""
+        return len(self.buffer)
+
+    def write(self, line):
+        with self.cond:
+            while len(self.buffer) >= self.max_lines and not self.closed:
+                self.cond.wait()
+            if self.closed:
+                return
+            self.buffer.append(line)
+            if len(self.buffer) >= self.flush_lines:
+                self.cond.notify_all()
+
+    def write_many(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self, timeout=5.0):
+        """Write everything buffered so far to the file and wait until it is done"""
+        with self.cond:
+            if self.closed:
+                return
+            self.flush_requested += 1
+            target = self.flush_requested
+            self.cond.notify_all()
+            self.cond.wait_for(lambda: self.flush_done >= target or self.closed, timeout)
+
+    def close(self):
+        """Flush the buffer and stop the writer thread"""
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join(timeout=5.0)
+        atexit.unregister(self.close)
+
+    def run(self):
+        last_fsync = time.monotonic()
+        dirty = False
+        while True:
+            with self.cond:
+                deadline = time.monotonic() + self.flush_interval
+                while (len(self.buffer) < self.flush_lines and not self.closed
+                       and self.flush_done >= self.flush_requested):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                lines = self.buffer
+                self.buffer = []
+                closing = self.closed
+                flush_target = self.flush_requested
+                # Wake writers waiting for space in the buffer
+                self.cond.notify_all()
+
+            if lines:
+                self.file.write("\n".join(lines) + "\n")
+                self.file.flush()
+                self.lines_written += len(lines)
+                dirty = True
+
+            now = time.monotonic()
+            if dirty and (self.fsync == "batch" or (self.fsync == "second" and now - last_fsync >= 1.0)):
+                os.fsync(self.file.fileno())
+                last_fsync = now
+                dirty = False
+
+            with self.cond:
+                self.flush_done = flush_target
+                self.cond.notify_all()
+
+            if closing:
+                if self.fsync != "none":
+                    os.fsync(self.file.fileno())
+                self.file.close()
+                return
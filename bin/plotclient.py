@@ -0,0 +1,65 @@
+import json
+import subprocess
+import sys
+import threading
+
+
+class PlotClient:
+    """Talks to a long-lived `plotdata.py --serve` process over its stdin / stdout
+
+    The server is started on the first plot and keeps pandas, matplotlib and
+    the parsed logs loaded, so later plots open almost at once. on_reply is
+    called from a reader thread with the message of every reply.
+    """
+
+    def __init__(self, on_reply, cache_size=4):
+        self.on_reply = on_reply
+        self.cache_size = cache_size
+        self.process = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "plotdata.py", "--serve", "--cache-size", str(self.cache_size)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(target=self.read_replies, args=(self.process,), daemon=True).start()
+
+    def plot(self, args):
+        """Send plotdata.py arguments to the server, restart it if it died"""
+        with self.lock:
+            for attempt in range(2):
+                if self.process is None or self.process.poll() is not None:
+                    self.start()
+                try:
+                    self.process.stdin.write(json.dumps(args) + "\n")
+                    self.process.stdin.flush()
+                    return
+                except (BrokenPipeError, OSError):
+                    self.process = None
+            self.on_reply("plot: could not start the plot server")
+
+    def read_replies(self, process):
+        for line in process.stdout:
+            try:
+                reply = json.loads(line)
+            except ValueError:
+                continue
+            self.on_reply(reply.get("message", ""))
+
+    def close(self):
+        """Close the server and its figures"""
+        with self.lock:
+            process = self.process
+            self.process = None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
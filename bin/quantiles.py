@@ -0,0 +1,274 @@
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import deque
+
+# Streaming quantiles (p50 / p95 / p99) in bounded memory.
+#
+# TDigest is a merging t-digest: values are buffered, then merged with the
+# existing centroids so that centroids near the tails stay small (accurate
+# p99) and the middle ones large. Two digests merge by adding the centroids
+# of one to the other, which is how sessions are combined for reports.
+
+DEFAULT_COMPRESSION = 100
+CACHE_NAME = "quantiles.json"
+
+
+class TDigest:
+    """Mergeable quantile sketch with at most about compression centroids"""
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.centroids = []     # (mean, weight) sorted by mean
+        self.buffer = []        # (value, weight) not merged yet
+        self.buffer_size = 5 * compression
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self):
+        return self.count
+
+    def add(self, value, weight=1):
+        self.buffer.append((value, weight))
+        self.count += weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self.buffer) >= self.buffer_size:
+            self.compress()
+
+    def merge(self, other):
+        """Add the values of another digest to this one"""
+        if other.count == 0:
+            return self
+        other.compress()
+        self.buffer.extend(other.centroids)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.compress()
+        return self
+
+    def k_scale(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def q_scale(self, k):
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def compress(self):
+        if not self.buffer:
+            return
+        items = self.centroids + self.buffer
+        items.sort()
+        self.buffer = []
+        total = self.count
+        merged = []
+        mean, weight = items[0]
+        done = 0
+        limit = self.q_scale(self.k_scale(0) + 1) * total
+        for item_mean, item_weight in items[1:]:
+            if done + weight + item_weight <= limit:
+                weight += item_weight
+                mean += (item_mean - mean) * item_weight / weight
+            else:
+                merged.append((mean, weight))
+                done += weight
+                limit = self.q_scale(self.k_scale(min(1.0, done / total)) + 1) * total
+                mean, weight = item_mean, item_weight
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def quantile(self, q):
+        """Estimated q-quantile (0..1), None without values"""
+        if self.count == 0:
+            return None
+        self.compress()
+        centroids = self.centroids
+        if len(centroids) == 1:
+            return centroids[0][0]
+        target = q * self.count
+        first_mean, first_weight = centroids[0]
+        if target < first_weight / 2:
+            return self.min + (first_mean - self.min) * target / (first_weight / 2)
+        done = 0
+        for (left_mean, left_weight), (right_mean, right_weight) in zip(centroids, centroids[1:]):
+            left_center = done + left_weight / 2
+            right_center = done + left_weight + right_weight / 2
+            if target <= right_center:
+                fraction = (target - left_center) / (right_center - left_center)
+                return left_mean + (right_mean - left_mean) * fraction
+            done += left_weight
+        last_mean, last_weight = centroids[-1]
+        tail = self.count - last_weight / 2
+        return last_mean + (self.max - last_mean) * min(1.0, (target - tail) / (last_weight / 2))
+
+    def to_dict(self):
+        self.compress()
+        return {
+            "compression": self.compression,
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "centroids": self.centroids,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data["compression"])
+        digest.centroids = [tuple(c) for c in data["centroids"]]
+        digest.count = data["count"]
+        digest.min = data["min"]
+        digest.max = data["max"]
+        return digest
+
+
+class WindowedDigest:
+    """Quantiles over the last seconds, from one TDigest per time bucket
+
+    The window moves in steps of seconds / buckets; a query merges the
+    digests of the buckets still in the window.
+    """
+
+    def __init__(self, seconds, buckets=6, compression=DEFAULT_COMPRESSION):
+        self.seconds = seconds
+        self.width = seconds / buckets
+        self.compression = compression
+        self.buckets = deque()      # (bucket number, TDigest)
+
+    def __len__(self):
+        return sum(len(digest) for _, digest in self.buckets)
+
+    def add(self, t, value):
+        number = int(t // self.width)
+        if not self.buckets or self.buckets[-1][0] != number:
+            self.buckets.append((number, TDigest(self.compression)))
+            self.expire(t)
+        self.buckets[-1][1].add(value)
+
+    def expire(self, now):
+        """Drop the buckets which ended before now - seconds"""
+        start = now - self.seconds
+        while self.buckets and (self.buckets[0][0] + 1) * self.width <= start:
+            self.buckets.popleft()
+
+    def clear(self):
+        self.buckets.clear()
+
+    def digest(self):
+        merged = TDigest(self.compression)
+        for _, digest in self.buckets:
+            merged.merge(digest)
+        return merged
+
+    def quantile(self, q):
+        return self.digest().quantile(q)
+
+
+def session_digests(path, channels, compression=DEFAULT_COMPRESSION):
+    """TDigest per channel for a .h2s session or a text log
+
+    For a session directory the result is cached in quantiles.json inside it
+    and reused while the number of rows does not change.
+    """
+    if os.path.isdir(path):
+        from bin.sessionstore import committed_rows, load_session
+        import numpy as np
+
+        rows = committed_rows(path)
+        cache = os.path.join(path, CACHE_NAME)
+        if os.path.exists(cache):
+            with open(cache, "r") as f:
+                cached = json.load(f)
+            if cached.get("rows") == rows and all(c in cached["digests"] for c in channels):
+                return {c: TDigest.from_dict(cached["digests"][c]) for c in channels}
+
+        columns = load_session(path)
+        digests = {}
+        for channel in channels:
+            digest = TDigest(compression)
+            values = np.asarray(columns[channel], dtype=float)
+            for value in values[~np.isnan(values)].tolist():
+                digest.add(value)
+            digests[channel] = digest
+        with open(cache, "w") as f:
+            json.dump({"rows": rows, "digests": {c: d.to_dict() for c, d in digests.items()}}, f)
+        return digests
+
+    from bin.telemetryparser import iter_log_file
+
+    digests = {channel: TDigest(compression) for channel in channels}
+    for _, sample in iter_log_file(path):
+        for channel, digest in digests.items():
+            value = sample.get(channel)
+            if value is not None:
+                digest.add(value)
+    return digests
+
+
+def benchmark(count=200000, compression=DEFAULT_COMPRESSION):
+    """Compare TDigest with exact numpy percentiles, prints error and speed"""
+    import numpy as np
+
+    rng = random.Random(1)
+    datasets = {
+        "uniform": [rng.uniform(0, 100) for _ in range(count)],
+        "normal": [rng.gauss(50, 10) for _ in range(count)],
+        # mostly steady current with rare spikes, like Iout
+        "spiky": [rng.gauss(10, 1) if rng.random() > 0.01 else rng.uniform(30, 60) for _ in range(count)],
+    }
+    for name, values in datasets.items():
+        digest = TDigest(compression)
+        start = time.perf_counter()
+        for value in values:
+            digest.add(value)
+        digest.compress()
+        elapsed = time.perf_counter() - start
+
+        exact = np.asarray(values)
+        start = time.perf_counter()
+        np.percentile(exact, [50, 95, 99])
+        exact_elapsed = time.perf_counter() - start
+
+        sorted_values = np.sort(exact)
+        parts = []
+        for q in (0.5, 0.95, 0.99, 0.999):
+            estimate = digest.quantile(q)
+            # error in rank: where the estimate really is in the data
+            rank = np.searchsorted(sorted_values, estimate) / count
+            parts.append(f"p{q * 100:g}: {estimate:.3f} vs {np.percentile(exact, q * 100):.3f} (rank err {abs(rank - q):.4f})")
+        print(f"{name}: {count / elapsed:,.0f} values/s, {len(digest.centroids)} centroids, "
+              f"numpy percentile on the whole array {exact_elapsed * 1000:.1f} ms")
+        for part in parts:
+            print(f"    {part}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Merged quantiles of sessions, or a TDigest benchmark.")
+    parser.add_argument("files", nargs="*", help=".h2s session directories or text logs")
+    parser.add_argument("-v", "--vars", nargs="+", default=["Iout", "Pfc", "Tfc"], help="channels")
+    parser.add_argument("--benchmark", action="store_true", help="compare with exact numpy percentiles")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        sys.exit(0)
+    if not args.files:
+        parser.error("no files given")
+
+    merged = {channel: TDigest() for channel in args.vars}
+    for path in args.files:
+        for channel, digest in session_digests(path, args.vars).items():
+            merged[channel].merge(digest)
+    for channel, digest in merged.items():
+        if len(digest) == 0:
+            print(f"{channel}: no data")
+            continue
+        print(f"{channel}: p50 {digest.quantile(0.5):.2f} | p95 {digest.quantile(0.95):.2f} | "
+              f"p99 {digest.quantile(0.99):.2f} | max {digest.max:.2f} ({len(digest)} samples)")
@@ -1,50 +1,143 @@
 from textual.widgets import Static
+import threading
+import time
 import psutil
 
+SAMPLE_INTERVAL = 1.0       # seconds between CPU / RAM samples
+BATTERY_INTERVAL = 30.0     # seconds between battery samples, the battery changes slowly
+
+
+class ResourceSampler:
+    """Samples CPU and RAM of this process (and an optional child) in a background thread
+
+    psutil's cpu_percent(interval=None) compares with the previous call, so
+    nothing here waits except the thread itself. The latest values are
+    published as a dict in self.snapshot, which is replaced, never modified.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, battery_interval=BATTERY_INTERVAL):
+        self.interval = interval
+        self.battery_interval = battery_interval
+        self.process = psutil.Process()
+        self.child = None
+        self.child_name = None
+        self.battery = None
+        self.battery_time = None
+        self.snapshot = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def watch(self, pid, name=None):
+        """Also sample the given process (e.g. the data_stream script), None to stop"""
+        if pid is None:
+            self.child = None
+            self.child_name = None
+            return
+        try:
+            child = psutil.Process(pid)
+            child.cpu_percent(None)    # first call only starts the measurement
+        except psutil.Error:
+            child = None
+        self.child_name = name
+        self.child = child
+
+    def run(self):
+        self.process.cpu_percent(None)
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.snapshot = self.sample()
+            except Exception:
+                self.snapshot = {"error": True}
+
+    def sample(self):
+        now = time.monotonic()
+        if self.battery_time is None or now - self.battery_time >= self.battery_interval:
+            self.battery = psutil.sensors_battery()
+            self.battery_time = now
+
+        snapshot = {
+            "cpu": self.process.cpu_percent(None),
+            "rss": self.process.memory_info().rss,
+            "battery": self.battery,
+        }
+
+        child = self.child
+        if child is not None:
+            try:
+                with child.oneshot():
+                    snapshot["child_cpu"] = child.cpu_percent(None)
+                    snapshot["child_rss"] = child.memory_info().rss
+                snapshot["child_name"] = self.child_name or child.name()
+            except psutil.Error:
+                pass  # the script has exited, the app notices on its own
+        return snapshot
+
+
 class ResourceMonitor(Static):
     def __init__(self):
         super().__init__()
-        self.process = psutil.Process()
-        self.update_resources()
-    
-    def update_resources(self):
-        try:
-            cpu_percent = self.process.cpu_percent(interval=0.1)    
-            memory_info = self.process.memory_info()
-            battery = psutil.sensors_battery()
-            memory_mb = memory_info.rss / 1024 / 1024
-            if battery == None:
-                self.update(
-                    f"Resources | "
-                    f"CPU: {cpu_percent:.2f}% | "
-                    f"RAM: {memory_mb:.1f} MB\n"
-                    f"Battery: N/A"
-                )
-            else:
-                if battery.secsleft == psutil.POWER_TIME_UNLIMITED:
-                    self.update(
-                        f"Resources | "
-                        f"CPU: {cpu_percent:.2f}% | "
-                        f"RAM: {memory_mb:.1f} MB\n"
-                        f"Battery: plugged in" 
-                )
-            
-                elif battery.secsleft == psutil.POWER_TIME_UNKNOWN:
-                    self.update(
-                        f"Resources | "
-                        f"CPU: {cpu_percent:.2f}% | "
-                        f"RAM: {memory_mb:.1f} MB\n"
-                        f"Battery: {battery.percent}%"
-                )
-                else:
-                    hours = battery.secsleft // 3600
-                    minutes = (battery.secsleft % 3600) // 60
-                    self.update(
-                        f"Resources | "
-                        f"CPU: {cpu_percent:.2f}% | "
-                        f"RAM: {memory_mb:.1f} MB\n"
-                        f"Battery: {battery.percent}% - {hours}h {minutes}m"
-                    )
-                    
-        except Exception:
+        self.sampler = ResourceSampler()
+        self.update("[dim]Resources | sampling...[/dim]")
+
+    def on_mount(self):
+        self.sampler.start()
+
+    def on_unmount(self):
+        self.sampler.stop()
+
+    def watch_process(self, pid, name=None):
+        """Show CPU and RAM of a child process (the data stream script), None to stop"""
+        self.sampler.watch(pid, name)
+
+    def format_battery(self, battery):
+        if battery is None:
+            return "Battery: N/A"
+        if battery.secsleft == psutil.POWER_TIME_UNLIMITED:
+            return "Battery: plugged in"
+        if battery.secsleft == psutil.POWER_TIME_UNKNOWN:
+            return f"Battery: {battery.percent}%"
+        hours = battery.secsleft // 3600
+        minutes = (battery.secsleft % 3600) // 60
+        return f"Battery: {battery.percent}% - {hours}h {minutes}m"
+
+    def update_resources(self, pipeline=None):
+        """Show the latest snapshot of the sampler, never waits for a measurement
+
+        pipeline is an optional dict with "queue", "lines_per_sec" and "log_backlog".
+        """
+        snapshot = self.sampler.snapshot
+        if snapshot is None:
+            return
+        if "error" in snapshot:
             self.update("[dim]Resource monitoring unavailable[/dim]")
+            return
+
+        lines = [
+            f"Resources | "
+            f"CPU: {snapshot['cpu']:.2f}% | "
+            f"RAM: {snapshot['rss'] / 1024 / 1024:.1f} MB | "
+            f"{self.format_battery(snapshot['battery'])}"
+        ]
+        if "child_cpu" in snapshot:
+            lines.append(
+                f"{snapshot['child_name']} | "
+                f"CPU: {snapshot['child_cpu']:.2f}% | "
+                f"RAM: {snapshot['child_rss'] / 1024 / 1024:.1f} MB"
+            )
+        if pipeline is not None:
+            lines.append(
+                f"Pipeline | "
+                f"{pipeline['lines_per_sec']:.0f} lines/s | "
+                f"queue: {pipeline['queue']} | "
+                f"log backlog: {pipeline['log_backlog']}"
+            )
+        self.update("\n".join(lines))
@@ -0,0 +1,79 @@
+import math
+from collections import deque
+
+
+class RollingStats:
+    """Min, max, mean and std of one channel over the last seconds
+
+    Every value is added and removed once, so updates are amortised O(1):
+    - values: (time, value) in the window, for the running sums
+    - mins / maxs: monotonic deques, the front is the current min / max
+    Mean and variance come from running sums of the values and their squares.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.values = deque()
+        self.mins = deque()
+        self.maxs = deque()
+        self.sum = 0.0
+        self.sum_sq = 0.0
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, t, value):
+        self.values.append((t, value))
+        self.sum += value
+        self.sum_sq += value * value
+        while self.mins and self.mins[-1][1] > value:
+            self.mins.pop()
+        self.mins.append((t, value))
+        while self.maxs and self.maxs[-1][1] < value:
+            self.maxs.pop()
+        self.maxs.append((t, value))
+        self.expire(t)
+
+    def expire(self, now):
+        """Drop the values older than now - seconds"""
+        start = now - self.seconds
+        values = self.values
+        while values and values[0][0] < start:
+            _, value = values.popleft()
+            self.sum -= value
+            self.sum_sq -= value * value
+        while self.mins and self.mins[0][0] < start:
+            self.mins.popleft()
+        while self.maxs and self.maxs[0][0] < start:
+            self.maxs.popleft()
+        if not values:
+            # Start again from exact zeros, the subtractions leave rounding errors
+            self.sum = 0.0
+            self.sum_sq = 0.0
+
+    def clear(self):
+        self.values.clear()
+        self.mins.clear()
+        self.maxs.clear()
+        self.sum = 0.0
+        self.sum_sq = 0.0
+
+    @property
+    def min(self):
+        return self.mins[0][1] if self.mins else None
+
+    @property
+    def max(self):
+        return self.maxs[0][1] if self.maxs else None
+
+    @property
+    def mean(self):
+        return self.sum / len(self.values) if self.values else None
+
+    @property
+    def std(self):
+        count = len(self.values)
+        if count == 0:
+            return None
+        mean = self.sum / count
+        return math.sqrt(max(0.0, self.sum_sq / count - mean * mean))
@@ -0,0 +1,310 @@
+import asyncio
+import os
+import time
+import serial
+from serial.serialutil import SerialException
+import serial.tools.list_ports
+from bin.logwriter import create_log_file, open_log_writer
+
+BASE_RECONNECT_DELAY = 1.0    # initial reconnect delay (seconds)
+MAX_RECONNECT_DELAY = 30.0    # maximum reconnect delay (seconds)
+POLL_INTERVAL = 0.01          # read interval when the port can not be watched by the event loop
+MAX_LINE_LENGTH = 65536       # unfinished data longer than this is passed on as one line
+RATE_REPORT_INTERVAL = 10.0   # seconds between bytes/s and lines/s reports
+
+
+def port_is_available(port_name):
+    """Return True if the port is listed by the OS or exists as a device file (e.g. a pty)"""
+    for p in serial.tools.list_ports.comports():
+        if p.device == port_name:
+            return True
+    return os.path.exists(port_name)
+
+
+class LineSplitter:
+    """Splits a byte stream into lines, the unfinished end is kept for the next chunk"""
+
+    def __init__(self):
+        self.carry = b""
+
+    def feed(self, chunk):
+        """Return the complete, non-empty lines in carry + chunk"""
+        data = self.carry + chunk
+        parts = data.split(b"\n")
+        self.carry = parts.pop()
+        if len(self.carry) > MAX_LINE_LENGTH:
+            parts.append(self.carry)
+            self.carry = b""
+
+        lines = []
+        for part in parts:
+            line = part.decode("utf-8", errors="ignore").strip()
+            if line:
+                lines.append(line)
+        return lines
+
+
+class RateMeter:
+    """Counts bytes and lines and reports the rates every few seconds"""
+
+    def __init__(self, interval=RATE_REPORT_INTERVAL):
+        self.interval = interval
+        self.start = time.monotonic()
+        self.bytes = 0
+        self.lines = 0
+
+    def add(self, nbytes, nlines):
+        self.bytes += nbytes
+        self.lines += nlines
+
+    def report(self):
+        """Return a rate message once per interval, otherwise None"""
+        now = time.monotonic()
+        elapsed = now - self.start
+        if elapsed < self.interval:
+            return None
+        message = f"rate {self.bytes / elapsed:.0f} B/s, {self.lines / elapsed:.1f} lines/s"
+        self.start = now
+        self.bytes = 0
+        self.lines = 0
+        return message
+
+
+class ChunkedLineReader:
+    """Blocking reader for the serialcom scripts
+
+    Reads everything the port has buffered in one call (or waits up to the
+    port timeout for the first byte) instead of one readline() per line.
+    """
+
+    def __init__(self, ser):
+        self.ser = ser
+        self.splitter = LineSplitter()
+        self.rate = RateMeter()
+
+    def read_lines(self):
+        """Return the complete lines received, [] after a timeout"""
+        chunk = self.ser.read(self.ser.in_waiting or 1)
+        if chunk and self.ser.in_waiting:
+            chunk += self.ser.read(self.ser.in_waiting)
+        lines = self.splitter.feed(chunk) if chunk else []
+        self.rate.add(len(chunk), len(lines))
+        return lines
+
+
+class AsyncSerialReader:
+    """Reads the serial port inside the asyncio event loop, without a subprocess or thread
+
+    Lines are passed to on_lines in the same "data:..." / "info:..." format
+    the serialcom scripts print, so the app handles both the same way.
+    Reconnects with exponential backoff like serialcomfeature2.py.
+    watch=False reads by polling even where the event loop could watch the port.
+    """
+
+    def __init__(self, port, baudrate, on_lines, log_path=None, watch=True):
+        self.port = port
+        self.baudrate = int(baudrate)
+        self.on_lines = on_lines
+        self.log_path = log_path
+        self.log_file = None
+        self.ser = None
+        self.fd = None
+        self.task = None
+        self.closed = None
+        self.stopping = False
+        self.watch = watch
+        self.rate = RateMeter()
+
+    def start(self):
+        self.stopping = False
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self):
+        """Stop reading and close the port"""
+        self.stopping = True
+        if self.closed is not None and not self.closed.done():
+            self.closed.set_result(None)
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        self.unwatch_port()
+        self.close_port()
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+    def info(self, message):
+        self.on_lines([f"info:{message}"])
+
+    async def run(self):
+        self.info("Starting serial communication...")
+        self.info(f"port={self.port} baudrate={self.baudrate}")
+        if self.log_path is None:
+            self.log_path = create_log_file()
+        self.log_file = open_log_writer(self.log_path)
+        self.info(f"Created log file: {os.path.basename(self.log_path)}")
+
+        reconnect_delay = BASE_RECONNECT_DELAY
+        while not self.stopping:
+            if not port_is_available(self.port):
+                self.info(f"Port {self.port} not visible to OS. Retrying in {reconnect_delay:.1f}s...")
+                await asyncio.sleep(reconnect_delay)
+                reconnect_delay = min(MAX_RECONNECT_DELAY, reconnect_delay * 1.5)
+                continue
+
+            try:
+                # timeout=0 makes read() return only what is already received
+                self.ser = serial.Serial(self.port, self.baudrate, timeout=0)
+            except (SerialException, OSError) as e:
+                self.info(f"Failed to open {self.port}: {e!s}. Retrying in {reconnect_delay:.1f}s...")
+                await asyncio.sleep(reconnect_delay)
+                reconnect_delay = min(MAX_RECONNECT_DELAY, reconnect_delay * 1.5)
+                continue
+
+            # Reset backoff on success
+            reconnect_delay = BASE_RECONNECT_DELAY
+            self.info(f"Connected to {self.ser.name}")
+
+            try:
+                await self.read_until_closed()
+            except (SerialException, OSError) as e:
+                self.info(f"Lost connection or read error: {e!s}")
+            finally:
+                self.close_port()
+
+            if not self.stopping:
+                self.info(f"Will attempt reconnect in {reconnect_delay:.1f}s...")
+                await asyncio.sleep(reconnect_delay)
+                reconnect_delay = min(MAX_RECONNECT_DELAY, reconnect_delay * 1.5)
+
+    async def read_until_closed(self):
+        """Read until the port fails or the reader is stopped"""
+        splitter = LineSplitter()
+        loop = asyncio.get_running_loop()
+
+        try:
+            if not self.watch:
+                raise NotImplementedError
+            self.closed = loop.create_future()
+            loop.add_reader(self.ser.fileno(), self.on_readable, splitter)
+            self.fd = self.ser.fileno()
+        except (AttributeError, NotImplementedError, OSError):
+            # Windows ports have no selectable file descriptor - poll instead
+            self.closed = None
+
+        if self.fd is None:
+            while not self.stopping:
+                self.read_chunk(splitter)
+                await asyncio.sleep(POLL_INTERVAL)
+            return
+
+        try:
+            await self.closed
+        finally:
+            self.unwatch_port()
+            self.closed = None
+
+    def on_readable(self, splitter):
+        try:
+            self.read_chunk(splitter)
+        except (SerialException, OSError) as e:
+            if self.closed is not None and not self.closed.done():
+                self.closed.set_exception(e)
+
+    def read_chunk(self, splitter):
+        chunk = self.ser.read(self.ser.in_waiting or 1)
+        if not chunk:
+            return
+        lines = splitter.feed(chunk)
+        self.rate.add(len(chunk), len(lines))
+        rate = self.rate.report()
+        if rate:
+            self.info(rate)
+        if not lines:
+            return
+        self.log_file.write_many(lines)
+        self.on_lines([f"data:{line}" for line in lines])
+
+    def unwatch_port(self):
+        if self.fd is not None:
+            asyncio.get_running_loop().remove_reader(self.fd)
+            self.fd = None
+
+    def close_port(self):
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+            self.ser = None
+
+
+if __name__ == "__main__":
+    # Check against a pty pair (Linux / macOS): lines split over partial
+    # writes, and a reconnect after the port goes away, for both the event
+    # loop and the polling path. The port is a symlink so the next pty can
+    # take its place.
+    import pty
+    import sys
+    import tempfile
+
+    BASE_RECONNECT_DELAY = 0.05
+
+    def open_port(link):
+        master, slave = pty.openpty()
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.ttyname(slave), link)
+        return master, slave
+
+    async def wait_for(received, count, timeout=5.0):
+        end = time.monotonic() + timeout
+        while len(received) < count and time.monotonic() < end:
+            await asyncio.sleep(0.01)
+
+    async def check(watch):
+        directory = tempfile.mkdtemp()
+        link = os.path.join(directory, "port")
+        received = []
+        infos = []
+
+        def on_lines(lines):
+            for line in lines:
+                (received if line.startswith("data:") else infos).append(line)
+
+        master, slave = open_port(link)
+        reader = AsyncSerialReader(link, 115200, on_lines, os.path.join(directory, "raw.txt"), watch=watch)
+        reader.start()
+        await asyncio.sleep(0.2)
+        for part in (b"Tim:1 Vb", b"at:7.5\nTim:2 Vbat:7", b".4\n\nTim:3", b" Vbat:7.3\n"):
+            os.write(master, part)
+            await asyncio.sleep(0.05)
+        await wait_for(received, 3)
+        split_ok = received == ["data:Tim:1 Vbat:7.5", "data:Tim:2 Vbat:7.4", "data:Tim:3 Vbat:7.3"]
+
+        # the device goes away, a new one appears under the same name
+        os.close(master)
+        os.close(slave)
+        await asyncio.sleep(0.3)
+        master, slave = open_port(link)
+        await asyncio.sleep(0.5)
+        os.write(master, b"Tim:4 Vbat:7.2\n")
+        await wait_for(received, 4)
+        reconnect_ok = received[3:] == ["data:Tim:4 Vbat:7.2"]
+        connects = sum(line.startswith("info:Connected to") for line in infos)
+
+        reader.stop()
+        os.close(master)
+        os.close(slave)
+        name = "event loop" if watch else "polling"
+        print(f"{name}: line splitting {'ok' if split_ok else 'FAILED'}, "
+              f"reconnect {'ok' if reconnect_ok and connects == 2 else 'FAILED'} ({connects} connects)")
+        if not (split_ok and reconnect_ok and connects == 2):
+            print("\n".join(received + infos))
+        return split_ok and reconnect_ok and connects == 2
+
+    async def main():
+        results = [await check(True), await check(False)]
+        return all(results)
+
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,417 @@
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime
+
+from bin.telemetryparser import CHANNELS, iter_log_file
+
+# A session is a directory "<name>.h2s" with one column file per channel:
+#   <channel>.col   64 byte header + fixed-width little-endian values, append only
+#   chunks.idx      one footer record per written chunk (end row, first/last host time)
+#   header.json     channel names, types and units
+#   agg_<s>.agg     aggregate level: one float64 row per s seconds of host time,
+#                   bucket start + min, max, mean, count of every channel
+# Rows are only valid up to the end row of the last chunk footer, so a crash
+# while writing leaves a readable session. Columns can be opened with numpy.memmap.
+# Aggregate levels are built while recording, each from the finished buckets
+# of the level below; a bucket is written when the next one starts.
+
+FORMAT_VERSION = 1
+MAGIC = b"H2COL\x00\x00\x01"
+COLUMN_HEADER = struct.Struct("<8s8s32s16x")   # magic, dtype, channel name
+CHUNK_FOOTER = struct.Struct("<Qdd")          # end row, first time, last time
+INT_MISSING = -2147483648
+
+AGG_MAGIC = b"H2AGG\x00\x00\x01"
+AGG_HEADER = struct.Struct("<8sdI44x")         # magic, bucket seconds, channel count
+AGG_LEVELS = (1, 10, 60, 600)                 # seconds
+AGG_FIELDS = ("min", "max", "mean", "count")
+
+# schema type -> (array typecode, numpy dtype)
+COLUMN_TYPES = {
+    "time": ("d", "<f8"),
+    "int": ("i", "<i4"),
+    "hex": ("i", "<i4"),
+    "float": ("f", "<f4"),
+}
+
+TIME_COLUMN = "time"
+
+
+def session_columns():
+    """(name, schema type, unit) of every column, host time first"""
+    return [(TIME_COLUMN, "time", "s")] + list(CHANNELS)
+
+
+class AggregateLevel:
+    """min / max / sum / count of every channel per bucket of seconds, appended to agg_<seconds>.agg"""
+
+    def __init__(self, path, seconds, channels):
+        self.seconds = seconds
+        self.channels = channels
+        self.bucket = None
+        self.rows = array("d")
+        self.file = open(os.path.join(path, f"agg_{seconds:g}.agg"), "wb")
+        self.file.write(AGG_HEADER.pack(AGG_MAGIC, seconds, channels))
+        self.clear()
+
+    def clear(self):
+        n = self.channels
+        self.mins = [float("inf")] * n
+        self.maxs = [float("-inf")] * n
+        self.sums = [0.0] * n
+        self.counts = [0] * n
+
+    def add(self, t, mins, maxs, sums, counts):
+        """Merge a sample or a finished lower bucket at time t, returns the bucket finished by it"""
+        bucket = int(t // self.seconds)
+        finished = None
+        if bucket != self.bucket:
+            finished = self.finish()
+            self.bucket = bucket
+        own_mins, own_maxs, own_sums, own_counts = self.mins, self.maxs, self.sums, self.counts
+        for i, count in enumerate(counts):
+            if count:
+                if mins[i] < own_mins[i]:
+                    own_mins[i] = mins[i]
+                if maxs[i] > own_maxs[i]:
+                    own_maxs[i] = maxs[i]
+                own_sums[i] += sums[i]
+                own_counts[i] += count
+        return finished
+
+    def finish(self):
+        """Store the current bucket, returns (start, mins, maxs, sums, counts) or None if empty"""
+        if self.bucket is None or not any(self.counts):
+            self.bucket = None
+            self.clear()
+            return None
+        start = self.bucket * self.seconds
+        row = [start]
+        nan = float("nan")
+        for low, high, total, count in zip(self.mins, self.maxs, self.sums, self.counts):
+            if count:
+                row.extend((low, high, total / count, count))
+            else:
+                row.extend((nan, nan, nan, 0))
+        self.rows.extend(row)
+        finished = (start, self.mins, self.maxs, self.sums, self.counts)
+        self.bucket = None
+        self.clear()
+        return finished
+
+    def flush(self):
+        if not self.rows:
+            return
+        if sys.byteorder == "big":
+            self.rows.byteswap()
+        self.file.write(self.rows.tobytes())
+        self.file.flush()
+        del self.rows[:]
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def create_session_dir(prefix="session"):
+    """Create a unique session directory in logs/"""
+    os.makedirs("./logs", exist_ok=True)
+    date_str = datetime.now().strftime("%Y%m%d")
+    k = 0
+    while os.path.exists(f"./logs/{prefix}{date_str}_{k}.h2s"):
+        k += 1
+    return f"./logs/{prefix}{date_str}_{k}.h2s"
+
+
+class SessionRecorder:
+    """Writes samples into the columnar session format, one chunk at a time"""
+
+    def __init__(self, path, chunk_rows=256):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.columns = session_columns()
+        self.rows = 0
+        os.makedirs(path, exist_ok=True)
+
+        with open(os.path.join(path, "header.json"), "w") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "created": time.time(),
+                "columns": [{"name": n, "type": t, "unit": u} for n, t, u in self.columns],
+            }, f, indent=2)
+
+        self.buffers = []
+        self.files = []
+        for name, kind, _ in self.columns:
+            typecode, dtype = COLUMN_TYPES[kind]
+            self.buffers.append(array(typecode))
+            f = open(os.path.join(path, f"{name}.col"), "wb")
+            f.write(COLUMN_HEADER.pack(MAGIC, dtype.encode(), name.encode()))
+            self.files.append(f)
+        self.missing = [INT_MISSING if COLUMN_TYPES[kind][0] == "i" else float("nan")
+                        for _, kind, _ in self.columns]
+        self.index = open(os.path.join(path, "chunks.idx"), "wb")
+        self.levels = [AggregateLevel(path, seconds, len(CHANNELS)) for seconds in AGG_LEVELS]
+
+    def append(self, sample, host_time=None):
+        """Add one parsed Sample, host_time defaults to now"""
+        if host_time is None:
+            host_time = time.time()
+        buffers = self.buffers
+        buffers[0].append(host_time)
+        for buffer, value, missing in zip(buffers[1:], sample, self.missing[1:]):
+            buffer.append(missing if value is None else value)
+        if host_time == host_time:     # samples without host time (NaN) have no bucket
+            values = [0.0 if value is None else value for value in sample]
+            counts = [0 if value is None else 1 for value in sample]
+            self.aggregate(0, host_time, values, values, values, counts)
+        if len(buffers[0]) >= self.chunk_rows:
+            self.flush()
+
+    def aggregate(self, level, t, mins, maxs, sums, counts):
+        """Add to a level, finished buckets go on to the next level"""
+        while level < len(self.levels):
+            finished = self.levels[level].add(t, mins, maxs, sums, counts)
+            if finished is None:
+                return
+            t, mins, maxs, sums, counts = finished
+            level += 1
+
+    def flush(self):
+        """Write the buffered rows and a chunk footer"""
+        times = self.buffers[0]
+        count = len(times)
+        if count == 0:
+            return
+        first_time, last_time = times[0], times[-1]
+        for buffer, f in zip(self.buffers, self.files):
+            if sys.byteorder == "big":
+                buffer.byteswap()
+            f.write(buffer.tobytes())
+            f.flush()
+            del buffer[:]
+        self.rows += count
+        self.index.write(CHUNK_FOOTER.pack(self.rows, first_time, last_time))
+        self.index.flush()
+        for level in self.levels:
+            level.flush()
+
+    def close(self):
+        # Finish the open buckets from the bottom, each goes into the level above
+        for i, level in enumerate(self.levels):
+            finished = level.finish()
+            if finished is not None:
+                self.aggregate(i + 1, *finished)
+        self.flush()
+        for f in self.files:
+            f.close()
+        self.index.close()
+        for level in self.levels:
+            level.close()
+
+
+def committed_rows(path):
+    """Number of rows covered by chunk footers"""
+    index_path = os.path.join(path, "chunks.idx")
+    size = os.path.getsize(index_path)
+    count = size // CHUNK_FOOTER.size
+    if count == 0:
+        return 0
+    with open(index_path, "rb") as f:
+        f.seek((count - 1) * CHUNK_FOOTER.size)
+        end_row, _, _ = CHUNK_FOOTER.unpack(f.read(CHUNK_FOOTER.size))
+    return end_row
+
+
+def column_dtypes(path):
+    """{column name: numpy dtype string} of a session, in header order"""
+    with open(os.path.join(path, "header.json"), "r") as f:
+        header = json.load(f)
+    dtypes = {}
+    for column in header["columns"]:
+        name = column["name"]
+        col_path = os.path.join(path, f"{name}.col")
+        with open(col_path, "rb") as f:
+            magic, dtype, _ = COLUMN_HEADER.unpack(f.read(COLUMN_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{col_path} is not a session column file")
+        dtypes[name] = dtype.rstrip(b"\0").decode()
+    return dtypes
+
+
+def load_session(path):
+    """Open every column of a session as a read-only numpy.memmap (no copy)"""
+    import numpy as np
+
+    dtypes = column_dtypes(path)
+    rows = committed_rows(path)
+
+    columns = {}
+    for name, dtype in dtypes.items():
+        if rows == 0:
+            columns[name] = np.zeros(0, dtype=dtype)
+            continue
+        columns[name] = np.memmap(os.path.join(path, f"{name}.col"), dtype=dtype, mode="r",
+                                  offset=COLUMN_HEADER.size, shape=(rows,))
+    return columns
+
+
+def aggregate_levels(path):
+    """Bucket seconds of the aggregate levels of a session, smallest first"""
+    levels = []
+    for name in os.listdir(path):
+        if name.startswith("agg_") and name.endswith(".agg"):
+            with open(os.path.join(path, name), "rb") as f:
+                magic, seconds, _ = AGG_HEADER.unpack(f.read(AGG_HEADER.size))
+            if magic == AGG_MAGIC:
+                levels.append(seconds)
+    return sorted(levels)
+
+
+def load_aggregate(path, seconds):
+    """Open one aggregate level as a read-only numpy.memmap (rows x (1 + 4 * channels))
+
+    Column 0 is the bucket start, then min, max, mean, count for every
+    channel in schema order, see aggregate_column().
+    """
+    import numpy as np
+
+    agg_path = os.path.join(path, f"agg_{seconds:g}.agg")
+    with open(agg_path, "rb") as f:
+        magic, _, channels = AGG_HEADER.unpack(f.read(AGG_HEADER.size))
+    if magic != AGG_MAGIC:
+        raise ValueError(f"{agg_path} is not an aggregate file")
+    width = 1 + len(AGG_FIELDS) * channels
+    rows = (os.path.getsize(agg_path) - AGG_HEADER.size) // (8 * width)
+    if rows == 0:
+        return np.zeros((0, width))
+    return np.memmap(agg_path, dtype="<f8", mode="r", offset=AGG_HEADER.size, shape=(rows, width))
+
+
+def aggregate_column(channel, field):
+    """Column of channel / field ("min", "max", "mean", "count") in load_aggregate()"""
+    names = [name for name, _, _ in CHANNELS]
+    return 1 + len(AGG_FIELDS) * names.index(channel) + AGG_FIELDS.index(field)
+
+
+def pick_aggregate_level(path, max_points):
+    """The finest aggregate level with at most max_points buckets, the coarsest if none has
+
+    Returns None when the session has no non-empty aggregate level (e.g. a
+    converted log without host times), then the raw columns have to be used.
+    """
+    levels = [seconds for seconds in aggregate_levels(path) if len(load_aggregate(path, seconds))]
+    if not levels:
+        return None
+    for seconds in levels:
+        if len(load_aggregate(path, seconds)) <= max_points:
+            return seconds
+    return levels[-1]
+
+
+def aggregate_to_dataframe(path, seconds):
+    """Aggregate level as a DataFrame: <channel> (mean), <channel>_min, <channel>_max, indexed by bucket start"""
+    import pandas as pd
+
+    agg = load_aggregate(path, seconds)
+    data = {}
+    for name, _, _ in CHANNELS:
+        data[name] = agg[:, aggregate_column(name, "mean")]
+        data[f"{name}_min"] = agg[:, aggregate_column(name, "min")]
+        data[f"{name}_max"] = agg[:, aggregate_column(name, "max")]
+    df = pd.DataFrame(data, index=pd.Index(agg[:, 0], name="time"))
+    return df.dropna(axis=1, how="all")
+
+
+class SessionFollower:
+    """Follows a session that is still being recorded, same interface as logreader.LogFollower
+
+    Every poll reads only the rows committed since the last one into arrays
+    that double their capacity when full.
+    """
+
+    host_column = TIME_COLUMN
+
+    def __init__(self, path, capacity=65536):
+        self.path = path
+        self.capacity = capacity
+        self.rows = 0
+        self.dtypes = None
+        self.columns = {}
+
+    def poll(self):
+        """Read the newly committed rows, returns how many were added"""
+        import numpy as np
+
+        if self.dtypes is None:
+            self.dtypes = column_dtypes(self.path)
+            self.columns = {name: np.empty(self.capacity, dtype) for name, dtype in self.dtypes.items()}
+        rows = committed_rows(self.path)
+        added = rows - self.rows
+        if added <= 0:
+            return 0
+        if rows > self.capacity:
+            self.capacity = max(rows, 2 * self.capacity)
+            for name, values in self.columns.items():
+                grown = np.empty(self.capacity, values.dtype)
+                grown[:self.rows] = values[:self.rows]
+                self.columns[name] = grown
+        for name, dtype in self.dtypes.items():
+            new = np.memmap(os.path.join(self.path, f"{name}.col"), dtype=dtype, mode="r",
+                            offset=COLUMN_HEADER.size + self.rows * np.dtype(dtype).itemsize, shape=(added,))
+            self.columns[name][self.rows:rows] = new
+            del new
+        self.rows = rows
+        return added
+
+    def column(self, name, last=None):
+        """One channel as floats (missing values NaN), only the last rows if given"""
+        import numpy as np
+
+        start = 0 if last is None else max(0, self.rows - last)
+        values = self.columns[name][start:self.rows]
+        if values.dtype.kind == "i":
+            values = np.where(values == INT_MISSING, np.nan, values)
+        return values.astype(float)
+
+
+def session_to_dataframe(path):
+    """Load a session as a float DataFrame, missing values become NaN"""
+    import numpy as np
+    import pandas as pd
+
+    data = {}
+    for name, values in load_session(path).items():
+        if values.dtype.kind == "i":
+            values = np.where(values == INT_MISSING, np.nan, values)
+        data[name] = values
+    df = pd.DataFrame(data)
+    return df.dropna(axis=1, how="all")
+
+
+def convert_text_log(log_path, out_path=None):
+    """Convert a rawdatalog*.txt / appdatalog*.txt file into a session directory"""
+    if out_path is None:
+        out_path = os.path.splitext(log_path)[0] + ".h2s"
+    recorder = SessionRecorder(out_path, chunk_rows=4096)
+    for host_time, sample in iter_log_file(log_path):
+        recorder.append(sample, float("nan") if host_time is None else host_time)
+    recorder.close()
+    return out_path, recorder.rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert text logs into the columnar session format.")
+    parser.add_argument("files", nargs="+", help="rawdatalog*.txt or appdatalog*.txt files")
+    args = parser.parse_args()
+
+    for log_path in args.files:
+        start = time.perf_counter()
+        out_path, rows = convert_text_log(log_path)
+        print(f"{log_path} -> {out_path}: {rows} rows in {time.perf_counter() - start:.2f}s")
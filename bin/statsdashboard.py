@@ -1,7 +1,30 @@
+import numpy as np
 from textual.widgets import Static
 
+from bin.quantiles import TDigest, WindowedDigest
+from bin.rollingstats import RollingStats
+from bin.timeseries import COLUMN_INDEX
+
+NUMERIC_KEYS = ["Vbat", "Iout", "Pout", "Vfc","Pfc", "Tfc"]
+# Channels where one spike dominates the max, p95 / p99 are shown too
+QUANTILE_KEYS = ["Iout", "Pfc", "Tfc"]
+# unit, decimals
+FORMATS = {
+    "Vbat": ("V", 2),
+    "Iout": ("A", 2),
+    "Pout": ("W", 1),
+    "Vfc": ("V", 2),
+    "Pfc": ("W", 1),
+    "Tfc": ("°C", 1),
+}
+
+def window_label(seconds):
+    if seconds >= 60 and seconds % 60 == 0:
+        return f"{seconds // 60:g} min"
+    return f"{seconds:g} s"
+
 class StatsDashboard(Static):
-    def __init__(self):
+    def __init__(self, store, windows=(30, 300)):
         super().__init__()
         
         self.stats = {
@@ -12,76 +35,114 @@ class StatsDashboard(Static):
             "Pfc": {"min": float('inf'), "max": float('-inf'), "avg": 0, "count": 0, "sum": 0},
             "Tfc": {"min": float('inf'), "max": float('-inf'), "avg": 0, "count": 0, "sum": 0}
         }
-        self.update_stats(None, None, None)
+        # window seconds -> channel -> RollingStats over the last seconds of data
+        self.windows = {
+            seconds: {key: RollingStats(seconds) for key in NUMERIC_KEYS}
+            for seconds in windows
+        }
+        self.digests = {key: TDigest() for key in QUANTILE_KEYS}
+        self.window_digests = {
+            seconds: {key: WindowedDigest(seconds) for key in QUANTILE_KEYS}
+            for seconds in windows
+        }
+        self.store = store
+        self.seen = 0       # store.total already added to the statistics
+        self.napomenutiF = None
+        self.napomenutiV = None
+        self.draw()
     
-    def update_stats(self, data, napomenutiF, napomenutiV):
-        if data == None:
-            if self.stats["Vbat"]["count"] == 0:
-                self.update(
-                    f"[bold cyan]Statistics[/bold cyan]\n\n"
-                    f"Vbat: Min: -- V | "
-                    f"Max: -- V | Avg: -- V\n"
-                    f"Iout: Min: -- A | "
-                    f"Max: -- A | Avg: -- A\n"
-                    f"Pout: Min: -- W | "
-                    f"Max: -- W | Avg: -- W\n"
-                    f"Vfc:  Min: -- V | "
-                    f"Max: -- V | Avg: -- V\n"
-                    f"Pfc:  Min: -- W | "
-                    f"Max: -- W | Avg: -- W\n"
-                    f"Tfc:  Min: -- °C | "
-                    f"Max: -- °C | Avg: -- °C\n"
-                    f"Napomenuti Filip: {napomenutiF}\n"
-                    f"Napomenuti Vitek: {napomenutiV}\n"
-                )
+    def read_store(self):
+        """Add the samples stored since the last call to the statistics"""
+        rows, self.seen = self.store.new_rows(self.seen)
+        if len(rows) == 0:
+            return
+        times = rows[:, COLUMN_INDEX["time"]]
+        for key in NUMERIC_KEYS:
+            values = rows[:, COLUMN_INDEX[key]]
+            valid = ~np.isnan(values)
+            if not valid.any():
+                continue
+            stat = self.stats[key]
+            present = values[valid]
+            stat["min"] = min(stat["min"], float(present.min()))
+            stat["max"] = max(stat["max"], float(present.max()))
+            stat["count"] += int(present.size)
+            stat["sum"] += float(present.sum())
+            stat["avg"] = stat["sum"] / stat["count"]
+
+            pairs = list(zip(times[valid].tolist(), present.tolist()))
+            for window in self.windows.values():
+                rolling = window[key]
+                for t, value in pairs:
+                    rolling.add(t, value)
+            if key in self.digests:
+                digest = self.digests[key]
+                for value in present.tolist():
+                    digest.add(value)
+                for window in self.window_digests.values():
+                    for t, value in pairs:
+                        window[key].add(t, value)
+        # Channels missing in the new rows still age out
+        now = float(times[-1])
+        for window in self.windows.values():
+            for rolling in window.values():
+                rolling.expire(now)
+        for window in self.window_digests.values():
+            for digest in window.values():
+                digest.expire(now)
+
+    def set_warnings(self, napomenutiF, napomenutiV):
+        self.napomenutiF = napomenutiF
+        self.napomenutiV = napomenutiV
+
+    def update_stats(self, napomenutiF, napomenutiV):
+        """Read new samples and redraw"""
+        self.set_warnings(napomenutiF, napomenutiV)
+        self.draw()
+
+    def draw(self):
+        self.read_store()
+        lines = ["[bold cyan]Statistics[/bold cyan]", ""]
+        for key in NUMERIC_KEYS:
+            stat = self.stats[key]
+            unit, decimals = FORMATS[key]
+            label = f"{key}:".ljust(5)
+            if stat["count"] == 0:
+                lines.append(f"{label} Min: -- {unit} | Max: -- {unit} | Avg: -- {unit}")
             else:
-                self.update(
-                    f"[bold cyan]Statistics[/bold cyan]\n\n"
-                    f"Vbat: Min: {self.stats['Vbat']['min']:.2f}V | "
-                    f"Max: {self.stats['Vbat']['max']:.2f}V | Avg: -- V\n"
-                    f"Iout: Min: {self.stats['Iout']['min']:.2f}A | "
-                    f"Max: {self.stats['Iout']['max']:.2f}A | Avg: -- A\n"
-                    f"Pout: Min: {self.stats['Tfc']['min']}W | "
-                    f"Max: {self.stats['Pout']['max']}W | Avg:-- W\n"
-                    f"Vfc:  Min: {self.stats['Vfc']['min']:.2f}V | "
-                    f"Max: {self.stats['Vfc']['max']:.2f}V | Avg: -- V\n"
-                    f"Pfc:  Min: {self.stats['Tfc']['min']}W | "
-                    f"Max: {self.stats['Pfc']['max']}W | Avg: -- W\n"
-                    f"Tfc:  Min: {self.stats['Tfc']['min']}°C | "
-                    f"Max: {self.stats['Tfc']['max']}°C | Avg: -- °C\n"
-                    f"Napomenuti Filip: {napomenutiF}\n"
-                    f"Napomenuti Vitek: {napomenutiV}\n"
+                lines.append(
+                    f"{label} Min: {stat['min']:.{decimals}f}{unit} | "
+                    f"Max: {stat['max']:.{decimals}f}{unit} | Avg: {stat['avg']:.{decimals}f}{unit}"
+                    + self.format_quantiles(self.digests.get(key), unit, decimals)
                 )
-        else:
-            numeric_keys = ["Vbat", "Iout", "Pout", "Vfc","Pfc", "Tfc"]
-            for key in numeric_keys:
-                if key in data:
-                    value = float(data[key])
-                    stat = self.stats[key]
-                    stat["min"] = min(stat["min"], value)
-                    stat["max"] = max(stat["max"], value)
-                    stat["count"] += 1
-                    stat["sum"] += value
-                    stat["avg"] = stat["sum"] / stat["count"]
-            
-            self.update(
-                f"[bold cyan]Statistics[/bold cyan]\n\n"
-                f"Vbat: Min: {self.stats['Vbat']['min']:.2f}V | "
-                f"Max: {self.stats['Vbat']['max']:.2f}V | Avg: {self.stats['Vbat']['avg']:.2f}V\n"
-                f"Iout: Min: {self.stats['Iout']['min']:.2f}A | "
-                f"Max: {self.stats['Iout']['max']:.2f}A | Avg: {self.stats['Iout']['avg']:.2f}A\n"
-                f"Pout: Min: {self.stats['Tfc']['min']}W | "
-                f"Max: {self.stats['Pout']['max']}W | Avg: {self.stats['Pout']['avg']:.1f}W\n"
-                f"Vfc:  Min: {self.stats['Vfc']['min']:.2f}V | "
-                f"Max: {self.stats['Vfc']['max']:.2f}V | Avg: {self.stats['Vfc']['avg']:.2f}V\n"
-                f"Pfc:  Min: {self.stats['Tfc']['min']}W | "
-                f"Max: {self.stats['Pfc']['max']}W | Avg: {self.stats['Pfc']['avg']:.1f}W\n"
-                f"Tfc:  Min: {self.stats['Tfc']['min']}°C | "
-                f"Max: {self.stats['Tfc']['max']}°C | Avg: {self.stats['Tfc']['avg']:.1f}°C\n"
-                f"Napomenuti Filip: {napomenutiF}\n"
-                f"Napomenuti Vitek: {napomenutiV}\n"
-            )
+        lines.append(f"Napomenuti Filip: {self.napomenutiF}")
+        lines.append(f"Napomenuti Vitek: {self.napomenutiV}")
+
+        for seconds, window in self.windows.items():
+            lines.append("")
+            lines.append(f"[bold]Last {window_label(seconds)}[/bold]")
+            for key in NUMERIC_KEYS:
+                rolling = window[key]
+                unit, decimals = FORMATS[key]
+                label = f"{key}:".ljust(5)
+                if len(rolling) == 0:
+                    lines.append(f"{label} -- {unit}")
+                else:
+                    lines.append(
+                        f"{label} {rolling.min:.{decimals}f} - {rolling.max:.{decimals}f}{unit} | "
+                        f"Avg: {rolling.mean:.{decimals}f}{unit} | Std: {rolling.std:.{decimals}f}{unit}"
+                        + self.format_quantiles(self.window_digests[seconds].get(key), unit, decimals)
+                    )
+        self.update("\n".join(lines) + "\n")
     
+    def format_quantiles(self, digest, unit, decimals):
+        if digest is None or len(digest) == 0:
+            return ""
+        if isinstance(digest, WindowedDigest):
+            digest = digest.digest()
+        return (f" | p95: {digest.quantile(0.95):.{decimals}f}{unit}"
+                f" | p99: {digest.quantile(0.99):.{decimals}f}{unit}")
+
     def reset_stats(self):
         for stat in self.stats.values():
             stat["min"] = float('inf')
@@ -89,3 +150,10 @@ class StatsDashboard(Static):
             stat["avg"] = 0
             stat["count"] = 0
             stat["sum"] = 0
+        for window in self.windows.values():
+            for rolling in window.values():
+                rolling.clear()
+        self.digests = {key: TDigest() for key in QUANTILE_KEYS}
+        for window in self.window_digests.values():
+            for digest in window.values():
+                digest.clear()
@@ -0,0 +1,221 @@
+import glob
+import math
+import time
+import numpy as np
+
+from bin.energy import BATTERY_MESSAGE, RACE_START_MESSAGES, STICK_MESSAGE
+from bin.telemetryparser import iter_log_lines
+
+# Swap schedule for hydrogen sticks and batteries.
+#
+# How long a stick / battery lasts is taken from past app logs (time between
+# the change messages), per stint number when there is data for it. A stint
+# of duration d with lifetime L ~ Normal(mean, std) costs
+#   E[max(L - d, 0)]                 capacity thrown away at the swap
+#   + dry_weight * E[max(d - L, 0)]  time running dry
+# and plan_stints() splits the remaining race time into the remaining stints
+# with the lowest expected cost by dynamic programming over a time grid.
+
+GRID_POINTS = 400       # time steps of the remaining race
+DRY_WEIGHT = 10.0       # a second dry costs as much as this many seconds of wasted capacity
+NOMINAL_STD = 0.1       # std of a stint as a fraction of the mean without measured data
+MIN_SAMPLES = 3         # measured stints needed for a per stint number profile
+
+PAUSE_MESSAGE = "Race paused"
+RESUME_MESSAGE = "Race resumed"
+
+
+class Profile:
+    """Lifetime of a stick or battery in seconds, as a normal distribution"""
+
+    def __init__(self, mean, std):
+        self.mean = mean
+        self.std = max(std, 1e-6 * max(mean, 1.0))
+
+    def __repr__(self):
+        return f"Profile(mean={self.mean:.0f}, std={self.std:.0f})"
+
+    def costs(self, durations, dry_weight=DRY_WEIGHT):
+        """Expected waste and dry seconds for an array of stint durations"""
+        z = (durations - self.mean) / self.std
+        pdf = np.exp(-0.5 * z * z) / math.sqrt(2 * math.pi)
+        cdf = 0.5 * (1 + ERF(z / math.sqrt(2)))
+        waste = self.std * pdf + (self.mean - durations) * (1 - cdf)
+        dry = waste + durations - self.mean
+        return np.maximum(waste, 0), np.maximum(dry, 0)
+
+
+ERF = np.vectorize(math.erf, otypes=[float])
+
+
+def measure_stints(paths):
+    """Durations of the stick and battery stints in app logs
+
+    Returns {"stick": [[seconds of stint 1, ...], [stint 2 ...], ...], "battery": ...};
+    a stint ends with a change message, pauses are not counted.
+    """
+    stints = {"stick": [], "battery": []}
+    files = []
+    for pattern in paths:
+        files.extend(sorted(glob.glob(pattern)) or [pattern])
+    for path in files:
+        try:
+            lines = iter_log_lines(path)
+            started = {}        # kind -> (start time, stint number) while a race runs
+            paused_at = None
+            for host_time, text in lines:
+                if host_time is None:
+                    continue
+                text = text.strip()
+                if text in RACE_START_MESSAGES:
+                    started = {"stick": (host_time, 0), "battery": (host_time, 0)}
+                    paused_at = None
+                elif text == PAUSE_MESSAGE:
+                    paused_at = host_time
+                elif text == RESUME_MESSAGE and paused_at is not None:
+                    pause = host_time - paused_at
+                    started = {kind: (start + pause, number) for kind, (start, number) in started.items()}
+                    paused_at = None
+                elif text in (STICK_MESSAGE, BATTERY_MESSAGE) and started:
+                    kind = "stick" if text == STICK_MESSAGE else "battery"
+                    start, number = started[kind]
+                    durations = stints[kind]
+                    while len(durations) <= number:
+                        durations.append([])
+                    durations[number].append(host_time - start)
+                    started[kind] = (host_time, number + 1)
+        except OSError:
+            continue
+    return stints
+
+
+def build_profiles(durations, nominal):
+    """Profile per stint number: measured when there is data, pooled or nominal otherwise"""
+    pooled = [d for number in durations for d in number]
+    if len(pooled) >= MIN_SAMPLES:
+        default = Profile(float(np.mean(pooled)), float(np.std(pooled)))
+    else:
+        default = Profile(nominal, nominal * NOMINAL_STD)
+    profiles = []
+    for number in durations:
+        if len(number) >= MIN_SAMPLES:
+            profiles.append(Profile(float(np.mean(number)), float(np.std(number))))
+        else:
+            profiles.append(default)
+    return profiles, default
+
+
+class Plan:
+    """Planned stint durations (seconds) from start, with expected waste / dry seconds"""
+
+    def __init__(self, start, durations, waste, dry, seconds):
+        self.start = start
+        self.durations = durations
+        self.waste = waste
+        self.dry = dry
+        self.seconds = seconds      # time the planning took
+
+    def swap_times(self):
+        """Race times of the planned swaps (the end of every stint but the last)"""
+        times = []
+        t = self.start
+        for duration in self.durations[:-1]:
+            t += duration
+            times.append(t)
+        return times
+
+
+def plan_stints(profiles, total, dry_weight=DRY_WEIGHT, grid_points=GRID_POINTS):
+    """Split total seconds into len(profiles) stints with the lowest expected cost
+
+    Dynamic programming over a grid of the remaining time: best[t] is the
+    lowest cost of covering the race from grid point t with the remaining
+    stints, computed for all t at once with numpy. The number of grid steps
+    is a multiple of the stint count, so the even split is on the grid and
+    comes out exactly when the profiles are the same.
+    """
+    started = time.perf_counter()
+    count = len(profiles)
+    steps = min(grid_points, int(math.ceil(total)))
+    grid = count * max(1, -(-steps // count))
+    step = total / grid
+    points = np.arange(grid + 1)
+    diff = points[None, :] - points[:, None]        # stint length in steps, from row to column
+    valid = diff >= 1
+    lengths = np.clip(diff, 0, grid)
+
+    cost_cache = {}
+    def stint_costs(profile):
+        key = id(profile)
+        if key not in cost_cache:
+            waste, dry = profile.costs(np.arange(grid + 1) * step, dry_weight)
+            cost_cache[key] = (waste, dry, waste + dry_weight * dry)
+        return cost_cache[key]
+
+    best = np.full(grid + 1, np.inf)
+    best[grid] = 0.0
+    choices = []
+    for profile in reversed(profiles):
+        _, _, cost = stint_costs(profile)
+        total_cost = np.where(valid, cost[lengths], np.inf) + best[None, :]
+        choice = np.argmin(total_cost, axis=1)
+        best = total_cost[points, choice]
+        choices.append(choice)
+    choices.reverse()
+
+    durations, waste, dry = [], 0.0, 0.0
+    position = 0
+    for profile, choice in zip(profiles, choices):
+        following = int(choice[position])
+        length = following - position
+        stint_waste, stint_dry, _ = stint_costs(profile)
+        durations.append(length * step)
+        waste += float(stint_waste[length])
+        dry += float(stint_dry[length])
+        position = following
+    return durations, waste, dry, time.perf_counter() - started
+
+
+class SwapPlanner:
+    """Plans the remaining stick and battery stints of the race
+
+    Profiles are measured from the app logs in strategy_logs of the race
+    config when it is (re)loaded; replan() itself only runs the DP.
+    """
+
+    def __init__(self, config):
+        self.set_config(config)
+
+    def set_config(self, config):
+        self.config = config
+        self.dry_weight = config.get("strategy_dry_weight", DRY_WEIGHT)
+        stints = measure_stints(config.get("strategy_logs", []))
+        duration = config["race_duration_seconds"]
+        self.profiles = {}
+        self.measured = {}
+        for kind, count_key in (("stick", "hydrogen_stick_count"), ("battery", "battery_count")):
+            nominal = duration / max(1, config[count_key])
+            self.profiles[kind] = build_profiles(stints[kind], nominal)
+            self.measured[kind] = sum(len(number) for number in stints[kind])
+
+    def profile(self, kind, number):
+        profiles, default = self.profiles[kind]
+        return profiles[number] if number < len(profiles) else default
+
+    def replan(self, kind, changes, start, current=None):
+        """Plan from the start of the current stint (race time start) to the race end
+
+        changes is the number of changes done, so the current stint has number
+        changes. current can replace the profile of the current stint, e.g. with
+        the data-driven forecast. Returns a Plan, or None with no time or stint left.
+        """
+        count_key = "hydrogen_stick_count" if kind == "stick" else "battery_count"
+        remaining = self.config[count_key] - changes
+        total = self.config["race_duration_seconds"] - start
+        if remaining <= 0 or total <= 0:
+            return None
+        profiles = [self.profile(kind, changes + i) for i in range(remaining)]
+        if current is not None:
+            profiles[0] = current
+        durations, waste, dry, seconds = plan_stints(profiles, total, self.dry_weight)
+        return Plan(start, durations, waste, dry, seconds)
@@ -0,0 +1,229 @@
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# Channel schema of the telemetry line, in the order the car sends them:
+# "Tim:1 Di:0x0 Pwm:0 Vbat:7.5 Iout:10.2 Pout:50.1 Vfc:9.1 Pfc:48.2 PfcDes:50 Tfc:45"
+CHANNELS = [
+    # name, type, unit
+    ("Tim", "int", "s"),
+    ("Di", "hex", ""),
+    ("Pwm", "int", ""),
+    ("Vbat", "float", "V"),
+    ("Iout", "float", "A"),
+    ("Pout", "float", "W"),
+    ("Vfc", "float", "V"),
+    ("Pfc", "float", "W"),
+    ("PfcDes", "float", "W"),
+    ("Tfc", "float", "°C"),
+]
+
+CHANNEL_NAMES = tuple(name for name, _, _ in CHANNELS)
+CHANNEL_TYPES = {name: kind for name, kind, _ in CHANNELS}
+CHANNEL_UNITS = {name: unit for name, _, unit in CHANNELS}
+CHANNEL_INDEX = {name: i for i, name in enumerate(CHANNEL_NAMES)}
+
+
+def parse_hex(value):
+    return int(value, 16)
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return int(float(value))
+
+
+CONVERTERS = {"int": parse_int, "hex": parse_hex, "float": float}
+CHANNEL_CONVERTERS = tuple(CONVERTERS[kind] for _, kind, _ in CHANNELS)
+
+# Fast path: all channels in the expected order, nothing else on the line
+FAST_LINE = re.compile(
+    r"\s*" + r"\s+".join(rf"{name}:(\S+)" for name in CHANNEL_NAMES) + r"\s*$"
+)
+
+
+# Converters of the fast path in schema order; plain int() there, a "1.0"
+# for an int channel falls back to the slow path like any bad value.
+FAST_CONVERTERS = tuple({"int": int, "hex": parse_hex, "float": float}[kind] for _, kind, _ in CHANNELS)
+
+
+def convert_fast(groups, converters=FAST_CONVERTERS):
+    """Convert the match groups of FAST_LINE, raises ValueError on a bad value"""
+    return tuple([convert(value) for convert, value in zip(converters, groups)])
+
+
+class Sample(namedtuple("SampleRecord", CHANNEL_NAMES)):
+    """One telemetry line with typed values in schema order, missing channels are None
+
+    Channels can be read as sample.Vbat or dict style as sample["Vbat"] /
+    sample.get("Vbat"), which the widgets use. A channel that is None counts
+    as missing.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if not isinstance(key, str):
+            return tuple.__getitem__(self, key)
+        index = CHANNEL_INDEX.get(key)
+        value = None if index is None else tuple.__getitem__(self, index)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        index = CHANNEL_INDEX.get(key)
+        return index is not None and tuple.__getitem__(self, index) is not None
+
+    def get(self, key, default=None):
+        index = CHANNEL_INDEX.get(key)
+        value = None if index is None else tuple.__getitem__(self, index)
+        return default if value is None else value
+
+    def keys(self):
+        return [name for name, value in zip(CHANNEL_NAMES, self) if value is not None]
+
+    def items(self):
+        return [(name, value) for name, value in zip(CHANNEL_NAMES, self) if value is not None]
+
+    def as_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"Sample({self.as_dict()})"
+
+
+def new_sample(values):
+    return tuple.__new__(Sample, values)
+
+
+def parse_line(line):
+    """Parse a telemetry line into a Sample, raises ValueError if it has no known channel"""
+    match = FAST_LINE.match(line)
+    if match:
+        try:
+            return tuple.__new__(Sample, convert_fast(match.groups()))
+        except ValueError:
+            pass
+    return parse_line_slow(line)
+
+
+def parse_line_slow(line):
+    """Parser for reordered, missing or unknown keys, bad values become None"""
+    values = [None] * len(CHANNEL_NAMES)
+    found = False
+    for part in line.split():
+        key, sep, value = part.partition(":")
+        index = CHANNEL_INDEX.get(key)
+        if not sep or index is None:
+            continue
+        found = True
+        try:
+            values[index] = CHANNEL_CONVERTERS[index](value)
+        except ValueError:
+            pass
+    if not found:
+        raise ValueError(f"No telemetry channels in line: {line!r}")
+    return new_sample(values)
+
+
+def strip_log_prefix(line):
+    """Return the telemetry part of an app log line ("00012 12:00:01 | Tim:1 ...")"""
+    head, sep, tail = line.partition(" | ")
+    return tail if sep else line
+
+
+SESSION_HEADER = re.compile(r"---.*?(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})")
+BRACKET_TIME = re.compile(r"\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]\s*")
+APP_LOG_TIME = re.compile(r"\d+ (\d{2}):(\d{2}):(\d{2}) \| ")
+
+
+def iter_log_lines(path):
+    """Yield (host_time, text) for every line of a raw or app log
+
+    host_time is a unix timestamp when the line has one ("[2024-05-01 12:00:01] ..."
+    from serialcomfeature2.py --timestamp-lines, or the time of an app log line
+    combined with the date of the session header), otherwise None. text is the
+    line without the timestamp / line number prefix. Session headers are skipped.
+    """
+    session_start = None
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            if line.startswith("---"):
+                match = SESSION_HEADER.match(line)
+                if match:
+                    session_start = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S")
+                continue
+
+            host_time = None
+            match = BRACKET_TIME.match(line)
+            if match:
+                host_time = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S").timestamp()
+                line = line[match.end():]
+            else:
+                match = APP_LOG_TIME.match(line)
+                if match:
+                    line = line[match.end():]
+                    if session_start is not None:
+                        h, m, sec = (int(v) for v in match.groups())
+                        stamp = session_start.replace(hour=h, minute=m, second=sec)
+                        if stamp < session_start:
+                            stamp += timedelta(days=1)  # session went over midnight
+                        host_time = stamp.timestamp()
+            yield host_time, line
+
+
+def iter_log_file(path):
+    """Yield (host_time, Sample) for every telemetry line of a raw or app log, see iter_log_lines"""
+    for host_time, line in iter_log_lines(path):
+        try:
+            sample = parse_line(line)
+        except ValueError:
+            continue
+        yield host_time, sample
+
+
+if __name__ == "__main__":
+    # Micro-benchmark against the old dict-of-strings get_data
+    import random
+    import time
+
+    def get_data(data):
+        data = dict(p.split(":") for p in data.split())
+        return data
+
+    def make_line(t):
+        return (
+            f"Tim:{t} Di:{hex(random.choice([0, 1, 3, 8, 9, 11]))} Pwm:0 "
+            f"Vbat:{random.uniform(7, 9):.2f} Iout:{random.uniform(50, 70):.2f} "
+            f"Pout:{random.uniform(35, 60):.2f} Vfc:{random.uniform(7, 9):.2f} "
+            f"Pfc:{random.uniform(35, 60):.2f} PfcDes:{random.uniform(35, 60):.2f} "
+            f"Tfc:{random.randint(40, 80)}"
+        )
+
+    lines = [make_line(t) for t in range(200000)]
+    reordered = [" ".join(reversed(line.split())) for line in lines]
+
+    def consume_old(line):
+        # what the widgets did with get_data: float() on every channel they show
+        data = get_data(line)
+        return [float(data[name]) for name in ("Vbat", "Iout", "Pout", "Vfc", "Pfc", "Tfc")], data["Di"]
+
+    def consume_new(line):
+        sample = parse_line(line)
+        return [sample.Vbat, sample.Iout, sample.Pout, sample.Vfc, sample.Pfc, sample.Tfc], sample.Di
+
+    def bench(name, func, data):
+        start = time.perf_counter()
+        for line in data:
+            func(line)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<40} {len(data) / elapsed:>12,.0f} lines/s")
+
+    bench("get_data", get_data, lines)
+    bench("get_data + float() in widgets", consume_old, lines)
+    bench("parse_line (fast path)", parse_line, lines)
+    bench("parse_line + typed access", consume_new, lines)
+    bench("parse_line (reordered, fallback)", parse_line, reordered)
@@ -0,0 +1,98 @@
+import math
+import time
+import numpy as np
+
+from bin.telemetryparser import CHANNEL_NAMES
+
+# In-memory history of the samples shown by the app. Every row is the host
+# time followed by the channels in schema order, missing values are NaN.
+# The ring buffer is stored twice back to back (row i and i + capacity hold
+# the same values), so the last n rows are always one contiguous slice and
+# windows are returned as numpy views without copying.
+
+COLUMNS = ("time",) + CHANNEL_NAMES
+COLUMN_INDEX = {name: i for i, name in enumerate(COLUMNS)}
+ROW_BYTES = 2 * 8 * len(COLUMNS)     # float64, stored twice
+
+
+class TimeSeriesStore:
+    """Last capacity samples of every channel in a float64 ring buffer
+
+    append() is O(1). rows(), column(), last_seconds() and new_rows() return
+    read-only views which stay valid until capacity more samples are
+    appended; copy them to keep them longer.
+    """
+
+    def __init__(self, capacity=100000):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.data = np.full((2 * capacity, len(COLUMNS)), np.nan)
+        self.head = 0       # next row to write, 0 .. capacity - 1
+        self.total = 0      # samples appended since the last clear()
+        self.last = None
+
+    @classmethod
+    def from_budget(cls, budget_mb):
+        """Create a store using at most budget_mb megabytes"""
+        return cls(max(1, int(budget_mb * 1024 * 1024) // ROW_BYTES))
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, sample, host_time=None):
+        """Add one parsed Sample, host_time defaults to now"""
+        row = [time.time() if host_time is None else host_time]
+        row.extend(math.nan if value is None else value for value in sample)
+        self.data[self.head] = row
+        self.data[self.head + self.capacity] = row
+        self.head += 1
+        if self.head == self.capacity:
+            self.head = 0
+        self.total += 1
+        self.last = sample
+
+    def latest(self):
+        """The last Sample of the running stream, None after end_stream()"""
+        return self.last
+
+    def end_stream(self):
+        """The data stream stopped, the history is kept"""
+        self.last = None
+
+    def clear(self):
+        self.head = 0
+        self.total = 0
+        self.last = None
+
+    def rows(self, n=None):
+        """View of the last n rows (all stored rows by default), oldest first"""
+        count = len(self)
+        n = count if n is None else max(0, min(n, count))
+        end = self.head + self.capacity
+        view = self.data[end - n:end]
+        view.flags.writeable = False
+        return view
+
+    def column(self, name, n=None):
+        """View of the last n values of one column, "time" for the host time"""
+        return self.rows(n)[:, COLUMN_INDEX[name]]
+
+    def last_seconds(self, seconds):
+        """View of the rows of the last seconds, by host time"""
+        rows = self.rows()
+        if len(rows) == 0:
+            return rows
+        times = rows[:, 0]
+        start = np.searchsorted(times, times[-1] - seconds, side="left")
+        return rows[start:]
+
+    def new_rows(self, seen):
+        """Rows appended after the first seen ones, and the new total
+
+        A reader keeps the returned total and passes it back next time. If
+        more than capacity rows arrived in between, the oldest are lost.
+        """
+        if seen > self.total:
+            seen = 0    # the store was cleared
+        return self.rows(self.total - seen), self.total
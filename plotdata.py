@@ -1,10 +1,22 @@
-import re
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import argparse
+import csv
 import os
 import glob
-
+import json
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from bin.telemetryparser import CHANNEL_NAMES
+from bin.logreader import HOST_TIME, LOG_COLUMNS, LogFollower, load_log_array
+from bin.downsample import MODES, downsample
+from bin.timeaxis import GrowingTimeAxis, TimeAxis
+from bin.sessionstore import SessionFollower, aggregate_to_dataframe, committed_rows, pick_aggregate_level, session_to_dataframe
 
 
 def find_newest_log():
@@ -13,35 +25,48 @@ def find_newest_log():
 
     print("Newest log:", newest)
     return newest
-def parse_log_file(path):
-    rows = []
 
-    with open(path, "r") as f:
-        for line in f:
-            if line.startswith("---"):
-                continue
 
-            pairs = re.findall(r"(\w+):([-\d\.]+)", line)
-            if not pairs:
-                continue
+def parse_log_file(path, use_cache=True):
+    data = load_log_array(path, use_cache=use_cache)
+    df = pd.DataFrame(data, columns=LOG_COLUMNS)
+    # Channels missing from the whole log are dropped, like before (and host_time without timestamps)
+    return df.dropna(axis=1, how="all")
 
-            row = {}
-            for key, value in pairs:
-                try:
-                    row[key] = float(value)
-                except ValueError:
-                    pass
 
-            rows.append(row)
+def time_axis(df):
+    """TimeAxis of a log or session DataFrame, see bin/timeaxis.py"""
+    host = None
+    for name in ("time", HOST_TIME):     # session column, raw log timestamps
+        if name in df.columns:
+            host = df[name].to_numpy()
+    tim = df["Tim"].to_numpy() if "Tim" in df.columns else np.full(len(df), np.nan)
+    return TimeAxis.build(tim=tim, host=host)
+
 
-    return pd.DataFrame(rows)
+def mark_gaps(ax, axis):
+    """Shade the gaps, resets as dashed lines"""
+    for start, end in axis.gap_spans():
+        ax.axvspan(start, end, color="grey", alpha=0.2, linewidth=0)
+    for reset in axis.times[axis.resets]:
+        ax.axvline(reset, color="red", linestyle="--", linewidth=0.8)
 
 
-def plot_variables_subplots(df, variables, last_n=None):
+def plot_variables_subplots(df, variables, last_n=None, points=2000, mode="lttb", x_axis="time"):
+    """Plot every variable in its own subplot, downsampled to about points values each
+
+    x_axis "time" uses the host time or the stitched Tim channel with the
+    gaps shown, "index" the row number.
+    """
     if last_n is not None and last_n > 0:
         df = df.tail(last_n)
 
-    x = df.index
+    axis = time_axis(df) if x_axis == "time" else None
+    if axis is None or axis.source == "index":
+        axis = None
+        x = np.arange(len(df))
+    else:
+        x = axis.times
     num_plots = len(variables)
 
     fig, axes = plt.subplots(num_plots, 1, figsize=(10, 3 * num_plots), sharex=True)
@@ -53,23 +78,194 @@ def plot_variables_subplots(df, variables, last_n=None):
             print(f"[WARNING] Variable '{var}' not found in log file.")
             continue
 
-        ax.plot(x, df[var])
+        line_x, line_y = downsample(x, df[var].to_numpy(), points, mode)
+        if axis is not None:
+            line_x, line_y = axis.break_gaps(line_x, line_y)
+            mark_gaps(ax, axis)
+        ax.plot(line_x, line_y)
         ax.set_ylabel(var)
         ax.set_title(var)
         ax.grid(True)
 
-    axes[-1].set_xlabel("Sample Index")
-    plt.tight_layout()
-    plt.show()
+    if axis is None:
+        axes[-1].set_xlabel("Sample Index")
+    else:
+        axes[-1].set_xlabel(f"Time [s] ({axis.source}, {len(axis.resets)} resets, {len(axis.gaps)} gaps)")
+    fig.tight_layout()
+    return fig
 
 
-if __name__ == "__main__":
-    find_newest_log()
+def plot_aggregate_subplots(df, variables, seconds):
+    """Plot an aggregate level: the mean as a line, min..max as a band"""
+    num_plots = len(variables)
+
+    fig, axes = plt.subplots(num_plots, 1, figsize=(10, 3 * num_plots), sharex=True)
+    if num_plots == 1:
+        axes = [axes]
+    if df.empty:
+        print(f"[WARNING] The {seconds:g} s aggregate level is empty.")
+        return fig
+    x = df.index - df.index[0]
+
+    for ax, var in zip(axes, variables):
+        if var not in df.columns:
+            print(f"[WARNING] Variable '{var}' not found in session.")
+            continue
+
+        ax.fill_between(x, df[f"{var}_min"], df[f"{var}_max"], alpha=0.3, linewidth=0)
+        ax.plot(x, df[var])
+        ax.set_ylabel(var)
+        ax.set_title(f"{var} ({seconds:g} s min / mean / max)")
+        ax.grid(True)
+
+    axes[-1].set_xlabel("Time [s]")
+    fig.tight_layout()
+    return fig
+
+
+class FollowPlot:
+    """Live plot of the last samples of a growing log or session
+
+    A timer polls the file fps times per second; the follower parses only
+    what was appended. The x axis is the same TimeAxis as in the static
+    plots, extended over the appended rows every frame so it does not move
+    between frames; the lines break at gaps. The lines are animated artists drawn with
+    blitting on a saved background, the axes are only redrawn when the data
+    leaves the current limits (then the x range jumps ahead by a quarter window).
+    """
+
+    def __init__(self, path, variables, window=2000, points=2000, mode="lttb", fps=5):
+        if path.rstrip("/\\").endswith(".h2s"):
+            self.follower = SessionFollower(path)
+        else:
+            self.follower = LogFollower(path)
+        self.window = window
+        self.points = points
+        self.mode = mode
+        self.variables = [var for var in variables if var in CHANNEL_NAMES]
+        for var in variables:
+            if var not in CHANNEL_NAMES:
+                print(f"[WARNING] Unknown variable '{var}'.")
+
+        num_plots = max(1, len(self.variables))
+        self.fig, axes = plt.subplots(num_plots, 1, figsize=(10, 3 * num_plots), sharex=True)
+        self.axes = [axes] if num_plots == 1 else list(axes)
+        self.lines = []
+        for ax, var in zip(self.axes, self.variables):
+            (line,) = ax.plot([], [], animated=True)
+            self.lines.append(line)
+            ax.set_ylabel(var)
+            ax.set_title(f"{var} (live)")
+            ax.grid(True)
+        self.axes[-1].set_xlabel("Sample Index")
+        self.fig.tight_layout()
+
+        self.axis = GrowingTimeAxis()
+        self.source = None
+        self.background = None
+        self.fig.canvas.mpl_connect("draw_event", self.on_draw)
+        self.timer = self.fig.canvas.new_timer(interval=int(1000 / fps))
+        self.timer.add_callback(self.update)
+        self.timer.start()
+
+    def on_draw(self, event):
+        """Full redraw (limits changed, resize): save the background without the lines"""
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        for ax, line in zip(self.axes, self.lines):
+            ax.draw_artist(line)
+
+    def update(self):
+        try:
+            added = self.follower.poll()
+        except (OSError, ValueError):
+            return
+        if not added or self.follower.rows == 0:
+            return
+        rows = self.follower.rows
+        start = max(0, rows - self.window)
+        axis = self.axis
+        axis.extend(tim=self.follower.column("Tim"), host=self.follower.column(self.follower.host_column))
+        x = axis.times[start:rows]
+        relimit = False
+        if axis.source != self.source:
+            self.source = axis.source
+            self.axes[-1].set_xlabel("Sample Index" if axis.source == "index" else f"Time [s] ({axis.source})")
+            relimit = True
+        for ax, line, var in zip(self.axes, self.lines, self.variables):
+            line_x, line_y = downsample(x, self.follower.column(var, self.window), self.points, self.mode)
+            line.set_data(*axis.break_gaps(line_x, line_y))
+            if len(line_y) and self.outside(ax, line_y):
+                low, high = np.min(line_y), np.max(line_y)
+                margin = (high - low) * 0.1 or 1.0
+                ax.set_ylim(low - margin, high + margin)
+                relimit = True
+        left, right = self.axes[0].get_xlim()
+        width = max(x[-1] - x[0], 1.0)
+        if x[-1] > right or x[0] < left - width:
+            # shared x axis: set it once
+            self.axes[0].set_xlim(x[0], x[0] + width * 1.25)
+            relimit = True
+
+        if relimit or self.background is None:
+            self.fig.canvas.draw()      # on_draw saves the background and draws the lines
+        else:
+            self.fig.canvas.restore_region(self.background)
+            self.draw_lines()
+            self.fig.canvas.blit(self.fig.bbox)
+        self.fig.canvas.flush_events()
+
+    @staticmethod
+    def outside(ax, values):
+        low, high = ax.get_ylim()
+        return np.nanmin(values) < low or np.nanmax(values) > high
+
+
+def follow_figure(args):
+    """Start a FollowPlot for parsed arguments, the figure keeps it alive"""
+    if args.file is None:
+        args.file = find_newest_log()
+    window = args.last if args.last else args.points     # wider windows are downsampled every frame
+    follow = FollowPlot(args.file, args.vars, window=window, points=args.points, mode=args.downsample, fps=args.fps)
+    follow.fig.follow_plot = follow    # the timer lives as long as the figure
+    return follow.fig
+
+
+class DataCache:
+    """Parsed logs and sessions, least recently used dropped first
+
+    Entries are keyed on the file size and mtime (of chunks.idx for a
+    session), so a log that grew is loaded again.
+    """
+
+    def __init__(self, maxsize=4):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def get(self, key, load):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        value = load()
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return value
+
+
+def file_key(path, *extra):
+    stamp_path = os.path.join(path, "chunks.idx") if os.path.isdir(path) else path
+    stat = os.stat(stamp_path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns) + extra
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description="Plot log file data.")
 
-    parser.add_argument("--file", "-f", type=str,
-                        default=find_newest_log(),
-                        help="Path to log file")
+    parser.add_argument("--file", "-f", type=str, default=None,
+                        help="Path to log file or .h2s session directory, the newest raw log by default")
 
     parser.add_argument("--last", "-l", type=int, default=None,
                         help="Number of last lines to plot")
@@ -78,7 +274,209 @@ if __name__ == "__main__":
                         default=["Pfc", "Vbat", "Iout", "Pout", "Tfc"],
                         help="Variables to plot (space-separated)")
 
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Parse the log again instead of using the .npz cache next to it")
+
+    parser.add_argument("--points", "-p", type=int, default=2000,
+                        help="Points per subplot: logs are downsampled and long sessions are plotted from an aggregate level with at most this many points")
+
+    parser.add_argument("--downsample", "-d", choices=MODES, default="lttb",
+                        help="lttb keeps the shape of the line, minmax keeps every spike, none plots every sample")
+
+    parser.add_argument("--x-axis", "-x", choices=("time", "index"), default="time",
+                        help="time: host time or the Tim channel with resets stitched and gaps shown, index: sample number")
+
+    parser.add_argument("--raw", action="store_true",
+                        help="Plot every sample of a session, not an aggregate level")
+
+    parser.add_argument("--follow", action="store_true",
+                        help="Live plot that follows the growing log or session, --last samples wide (--points by default)")
+
+    parser.add_argument("--fps", type=float, default=5,
+                        help="Redraws per second of --follow")
+
+    parser.add_argument("--report", nargs="?", const="reports", default=None, metavar="DIR",
+                        help="Render every log and session in logs/ (or --file) into DIR without a window, with a summary.csv")
+
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(),
+                        help="Processes rendering --report, one per core by default")
+
+    parser.add_argument("--formats", nargs="+", choices=("png", "svg", "pdf"), default=["png"],
+                        help="Image formats written by --report")
+
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as plot server: read argument lists as JSON lines from stdin")
+
+    parser.add_argument("--cache-size", type=int, default=4,
+                        help="Parsed logs kept in memory by the plot server")
+    return parser
+
+
+def make_figure(args, cache=None):
+    """Load the data for parsed arguments and return the figure"""
+    if args.follow:
+        return follow_figure(args)
+    if cache is None:
+        cache = DataCache(0)
+    if args.file is None:
+        args.file = find_newest_log()
+
+    if args.file.rstrip("/\\").endswith(".h2s"):
+        # columnar session directory, see bin/sessionstore.py
+        seconds = None
+        if not args.raw and args.last is None and committed_rows(args.file) > args.points:
+            seconds = pick_aggregate_level(args.file, args.points)
+        if seconds is not None:
+            df = cache.get(file_key(args.file, "agg", seconds), lambda: aggregate_to_dataframe(args.file, seconds))
+            return plot_aggregate_subplots(df, args.vars, seconds)
+        df = cache.get(file_key(args.file), lambda: session_to_dataframe(args.file))
+    elif args.no_cache:
+        df = parse_log_file(args.file, use_cache=False)
+    else:
+        df = cache.get(file_key(args.file), lambda: parse_log_file(args.file))
+    return plot_variables_subplots(df, args.vars, last_n=args.last, points=args.points, mode=args.downsample,
+                                   x_axis=args.x_axis)
+
+
+def find_sessions(pattern=None):
+    """Raw logs and recorded sessions for --report, largest first so the pool ends evenly"""
+    if pattern is None:
+        # converted logs are rawdatalog*.h2s sessions
+        paths = glob.glob("logs/rawdatalog*.txt") + glob.glob("logs/*.h2s")
+    else:
+        paths = glob.glob(pattern)
+
+    def size(path):
+        if os.path.isdir(path):
+            return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        return os.path.getsize(path)
+    return sorted(paths, key=size, reverse=True)
+
+
+def use_agg():
+    plt.switch_backend("Agg")
+
+
+def render_report(path, args, out_dir):
+    """Plot one log or session into out_dir, return its summary row
+
+    Runs in a worker process; the figure is drawn from the same data the
+    summary is computed on (a cached log is parsed only once).
+    """
+    started = time.perf_counter()
+    # with the extension, a log and its converted .h2s session get different images
+    name = os.path.basename(path.rstrip("/\\"))
+    row = {"file": path}
+    try:
+        cache = DataCache(2)
+        file_args = argparse.Namespace(**vars(args))
+        file_args.file = path
+        fig = make_figure(file_args, cache)
+        for fmt in args.formats:
+            fig.savefig(os.path.join(out_dir, f"{name}.{fmt}"))
+        plt.close(fig)
+
+        if path.rstrip("/\\").endswith(".h2s"):
+            df = session_to_dataframe(path)
+        else:
+            df = cache.get(file_key(path), lambda: parse_log_file(path, use_cache=not args.no_cache))
+        row["rows"] = len(df)
+        for var in args.vars:
+            values = df[var].to_numpy(dtype=float) if var in df.columns else np.array([np.nan])
+            if np.isnan(values).all():
+                continue
+            row[f"{var}_min"] = np.nanmin(values)
+            row[f"{var}_mean"] = np.nanmean(values)
+            row[f"{var}_max"] = np.nanmax(values)
+            row[f"{var}_p95"] = np.nanpercentile(values, 95)
+    except Exception as e:
+        row["error"] = str(e)
+    row["seconds"] = time.perf_counter() - started
+    return row
+
+
+def report(args):
+    """Render all sessions in parallel and write summary.csv, returns the rows"""
+    paths = find_sessions(args.file)
+    os.makedirs(args.report, exist_ok=True)
+    use_agg()
+    started = time.perf_counter()
+    rows = []
+    jobs = max(1, min(args.jobs or 1, len(paths) or 1))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=use_agg) as pool:
+        futures = [pool.submit(render_report, path, args, args.report) for path in paths]
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            status = f"error: {row['error']}" if "error" in row else f"{row['seconds']:.1f} s"
+            print(f"{row['file']}: {status}")
+    rows.sort(key=lambda row: row["file"])
+
+    fields = ["file", "rows"]
+    for var in args.vars:
+        fields += [f"{var}_{stat}" for stat in ("min", "mean", "max", "p95")]
+    fields += ["seconds", "error"]
+    with open(os.path.join(args.report, "summary.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: f"{value:.4g}" if isinstance(value, float) else value for key, value in row.items()})
+
+    print(f"Rendered {len(rows)} files into {args.report} in {time.perf_counter() - started:.1f} s with {jobs} processes")
+    return rows
+
+
+def serve(parser, cache_size):
+    """Plot server: one JSON list of plotdata arguments per stdin line
+
+    Every command gets one JSON line back on stdout: {"ok": bool, "message": str}.
+    Prints of the plotting code go to stderr. Figures stay open and
+    responsive while waiting for the next command; EOF on stdin ends it.
+    """
+    replies = sys.stdout
+    sys.stdout = sys.stderr
+    cache = DataCache(cache_size)
+    commands = queue.Queue()
+
+    def read_commands():
+        for line in sys.stdin:
+            commands.put(line)
+        commands.put(None)
+
+    threading.Thread(target=read_commands, daemon=True).start()
+
+    while True:
+        try:
+            if plt.get_fignums():
+                plt.pause(0.05)     # keeps the open figures responsive
+                line = commands.get_nowait()
+            else:
+                line = commands.get()
+        except queue.Empty:
+            continue
+        if line is None:
+            break
+        try:
+            args = parser.parse_args(json.loads(line))
+            fig = make_figure(args, cache)
+            fig.show()
+            reply = {"ok": True, "message": f"Plotted {args.file}"}
+        except SystemExit:
+            reply = {"ok": False, "message": "plot: invalid arguments"}
+        except Exception as e:
+            reply = {"ok": False, "message": f"plot: {e}"}
+        replies.write(json.dumps(reply) + "\n")
+        replies.flush()
+
+
+if __name__ == "__main__":
+    parser = build_parser()
     args = parser.parse_args()
 
-    df = parse_log_file(args.file)
-    plot_variables_subplots(df, args.vars, last_n=args.last)
+    if args.serve:
+        serve(parser, args.cache_size)
+    elif args.report:
+        report(args)
+    else:
+        make_figure(args)
+        plt.show()
@@ -2,6 +2,13 @@ import serial
 import sys
 import os
 import datetime
+import signal
+from bin.serialreader import ChunkedLineReader
+from bin.logwriter import open_log_writer, stop_on_request
+
+# Exit normally on a stop line from the app or on terminate so the log writer can flush
+stop_on_request()
+signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
 print("info:Starting serial communication...")
 print("info:port: ", sys.argv[1], "baudrate: ",sys.argv[2])
@@ -31,17 +38,23 @@ with open(f"./logs/rawdatalog{x}_{k}.txt", "a") as f:
     f.write(f"--- New session started at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
 
 print("info:Created log file:", f"rawdatalog{x}_{k}.txt")
+log = open_log_writer(f"./logs/rawdatalog{x}_{k}.txt")
+
+reader = ChunkedLineReader(ser)
 
 try:
     while True:
-        if ser.in_waiting > 0:
-            data = ser.readline().decode('utf-8', errors='ignore').strip()
-            if data:
-                print("data:",data)
-                with open(f"./logs/rawdatalog{x}_{k}.txt", "a") as f:
-                    f.write(data + "\n")
-                sys.stdout.flush()
+        # Blocks up to the port timeout, so the loop does not spin
+        lines = reader.read_lines()
+        if lines:
+            print("\n".join(f"data: {data}" for data in lines))
+            log.write_many(lines)
+        rate = reader.rate.report()
+        if rate:
+            print(f"info:{rate}")
+        sys.stdout.flush()
 except KeyboardInterrupt:   
     print("info:Exiting...")
 finally:
-    ser.close()
\ No newline at end of file
+    ser.close()
+    log.close()
\ No newline at end of file
@@ -3,7 +3,10 @@ import sys
 import os
 import datetime
 import time
+import signal
 from serial.serialutil import SerialException
+from bin.serialreader import ChunkedLineReader
+from bin.logwriter import open_log_writer, stop_on_request
 
 RECONNECT_DELAY = 5  # seconds
 
@@ -50,10 +53,16 @@ def main():
     print("info:Starting serial communication...")
     print(f"info:port={port} baudrate={baudrate}")
 
+    # Exit normally on a stop line from the app or on terminate so the log writer can flush
+    stop_on_request()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     ensure_log_dir()
     logfile = create_log_file()
+    log = open_log_writer(logfile)
 
     ser = None
+    reader = None
 
     try:
         while True:
@@ -64,16 +73,18 @@ def main():
                     print(f"info:Retrying in {RECONNECT_DELAY} seconds...")
                     time.sleep(RECONNECT_DELAY)
                     continue  # try again
+                reader = ChunkedLineReader(ser)
 
             try:
-                # Read incoming data
-                if ser.in_waiting > 0:
-                    raw = ser.readline().decode("utf-8", errors="ignore").strip()
-                    if raw:
-                        print("data:", raw)
-                        with open(logfile, "a") as f:
-                            f.write(raw + "\n")
-                        sys.stdout.flush()
+                # Read incoming data, blocks up to the port timeout
+                lines = reader.read_lines()
+                if lines:
+                    print("\n".join(f"data: {raw}" for raw in lines))
+                    log.write_many(lines)
+                rate = reader.rate.report()
+                if rate:
+                    print(f"info:{rate}")
+                sys.stdout.flush()
 
             except SerialException:
                 print("info:Lost connection! Attempting to reconnect...")
@@ -90,6 +101,7 @@ def main():
     finally:
         if ser:
             ser.close()
+        log.close()
 
 
 if __name__ == "__main__":
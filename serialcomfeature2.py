@@ -14,8 +14,10 @@ import sys
 import os
 import datetime
 import time
+import signal
 from serial.serialutil import SerialException
 import serial.tools.list_ports
+from bin.logwriter import open_log_writer, stop_on_request, TimestampCache
 
 KEEP_ALIVE_SLEEP = 0.05       # sleep between empty reads to avoid busy-looping
 BASE_RECONNECT_DELAY = 1.0    # initial reconnect delay (seconds)
@@ -54,12 +56,13 @@ def try_open(port, baudrate):
     return serial.Serial(port, baudrate, timeout=1)
 
 
-def log_to_file(path, line, timestamp_lines=False):
+timestamps = TimestampCache("%Y-%m-%d %H:%M:%S")
+
+
+def log_to_file(log, line, timestamp_lines=False):
     if timestamp_lines:
-        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        line = f"[{ts}] {line}"
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(line + "\n")
+        line = f"[{timestamps.now()}] {line}"
+    log.write(line)
 
 
 def main():
@@ -74,8 +77,13 @@ def main():
     print("info:Starting serial communication...")
     print(f"info:port={port} baudrate={baudrate}")
 
+    # Exit normally on a stop line from the app or on terminate so the log writer can flush
+    stop_on_request()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     ensure_log_dir()
     logfile = create_log_file()
+    log = open_log_writer(logfile)
 
     ser = None
     reconnect_delay = BASE_RECONNECT_DELAY
@@ -119,7 +127,7 @@ def main():
 
                 if decoded:
                     print("data:", decoded)
-                    log_to_file(logfile, decoded, timestamp_lines)
+                    log_to_file(log, decoded, timestamp_lines)
                     sys.stdout.flush()
 
             except (SerialException, OSError) as e:
@@ -150,6 +158,7 @@ def main():
                 ser.close()
             except Exception:
                 pass
+        log.close()
         print("info:Closed serial (if it was open).")
 
 
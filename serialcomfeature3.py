@@ -3,6 +3,9 @@ import sys
 import os
 import datetime
 import time
+import signal
+from bin.serialreader import ChunkedLineReader
+from bin.logwriter import open_log_writer, stop_on_request, TimestampCache
 
 RECONNECT_DELAY = 2  # seconds between reconnection attempts
 DATA_TIMEOUT = 30    # seconds of no data before considering connection stale
@@ -47,8 +50,15 @@ def main():
     print("info:Starting serial communication...")
     print(f"info:port: {port}, baudrate: {baudrate}")
     
+    # Exit normally on a stop line from the app or on terminate so the log writer can flush
+    stop_on_request()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     log_path = get_log_file()
+    log = open_log_writer(log_path)
+    timestamps = TimestampCache("%Y-%m-%d %H:%M:%S")
     ser = None
+    reader = None
     last_data_time = None
     
     try:
@@ -60,30 +70,30 @@ def main():
                     print(f"info:Retrying in {RECONNECT_DELAY}s...")
                     time.sleep(RECONNECT_DELAY)
                     continue
+                reader = ChunkedLineReader(ser)
                 last_data_time = time.time()
             
-            # Try to read data
+            # Try to read data, blocks up to the port timeout so the loop does not spin
             try:
-                if ser.in_waiting > 0:
-                    data = ser.readline().decode('utf-8', errors='ignore').strip()
-                    if data:
-                        last_data_time = time.time()
-                        print(f"data:{data}")
-                        with open(log_path, "a") as f:
-                            f.write(f"{data}\n")
-                        sys.stdout.flush()
+                lines = reader.read_lines()
+                if lines:
+                    last_data_time = time.time()
+                    print("\n".join(f"data:{data}" for data in lines))
+                    log.write_many(lines)
                 else:
                     # Check for data timeout (optional stale connection detection)
                     if last_data_time and (time.time() - last_data_time > DATA_TIMEOUT):
                         print(f"info:No data for {DATA_TIMEOUT}s, connection may be stale")
                         last_data_time = time.time()  # Reset to avoid spamming
-                    time.sleep(0.01)  # Small delay to prevent CPU spinning
+                rate = reader.rate.report()
+                if rate:
+                    print(f"info:{rate}")
+                sys.stdout.flush()
                     
             except (serial.SerialException, OSError) as e:
                 print(f"info:Serial error: {e}")
                 print("info:Attempting to reconnect...")
-                with open(log_path, "a") as f:
-                    f.write(f"--- Connection lost at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
+                log.write(f"--- Connection lost at {timestamps.now()} ---")
                 try:
                     ser.close()
                 except:
@@ -96,8 +106,8 @@ def main():
     finally:
         if ser and ser.is_open:
             ser.close()
-        with open(log_path, "a") as f:
-            f.write(f"--- Session ended at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
+        log.write(f"--- Session ended at {timestamps.now()} ---")
+        log.close()
         print("info:Cleanup complete")
 
 if __name__ == "__main__":
@@ -3,6 +3,12 @@ import time
 import sys
 import os
 import datetime
+import signal
+from bin.logwriter import open_log_writer, stop_on_request
+
+# Exit normally on a stop line from the app or on terminate so the log writer can flush
+stop_on_request()
+signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
 tim = 0
 di = 0
@@ -38,16 +44,20 @@ while os.path.exists(f"logs/simrawdatalog{x}_{k}.txt"):
     k += 1
 with open(f"logs/simrawdatalog{x}_{k}.txt", "a") as f:
     f.write(f"--- New session started at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
+log = open_log_writer(f"logs/simrawdatalog{x}_{k}.txt")
 
 while True:
     try:
         data = generate_data()
         print("data:", data)
-        with open(f"logs/simrawdatalog{x}_{k}.txt", "a") as f:
-            f.write(data + "\n")
+        log.write(data)
         sys.stdout.flush()
         time.sleep(1)
+    except KeyboardInterrupt:
+        log.close()
+        exit()
     except Exception as e:
         print("info:probably stopped ... or some error :)")
         print(e)
+        log.close()
         exit()
\ No newline at end of file
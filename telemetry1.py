@@ -21,6 +21,8 @@ from bin.dashboard import *
 from bin.statsdashboard import *
 from bin.errorstatus import *
 from bin.inputscreen import *
+from bin.telemetryparser import parse_line
+from bin.timeseries import TimeSeriesStore
 
 di = 0
 tim = 0
@@ -43,10 +45,6 @@ with open(f"./logs/appdatalog{x}_{k}.txt", "a") as f:
     f.write(f"--- New session started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
 
 
-def get_data(data):
-    data = dict(p.split(":") for p in data.split())
-    return data
-
 def load_race_config():
     """Load race configuration from file"""
     config_path = Path("config/race_config.json")
@@ -447,6 +445,7 @@ class DashboardLogApp(App):
         self.update_timer = None
         self.data_stream = None
         self.queue = Queue()
+        self.history = TimeSeriesStore()
         self.read_thread = None
         self.stop_event = None
         self.race_timer = None
@@ -467,10 +466,10 @@ class DashboardLogApp(App):
                         self.err_status = ErrorStatus()
                         yield self.err_status
 
-                        self.dashboard = Dashboard()
+                        self.dashboard = Dashboard(self.history)
                         yield self.dashboard
 
-                        self.stats = StatsDashboard()
+                        self.stats = StatsDashboard(self.history)
                         yield self.stats
                         self.race_tracker = RaceTracker()
                         yield self.race_tracker
@@ -695,8 +694,9 @@ class DashboardLogApp(App):
 
             if not self.is_connected:
                 data = None
-                self.dashboard.update_data(None)
-                self.stats.update_stats(None, napomenutiF, napomenutiV)
+                self.history.end_stream()
+                self.dashboard.draw()
+                self.stats.update_stats(napomenutiF, napomenutiV)
                 self.err_status.update_status(None, nodata)
                 return
                 
@@ -721,13 +721,14 @@ class DashboardLogApp(App):
                 
                 if data_type[0] == "data":
                     try:
-                        parsed_data = get_data(data_type[1])
+                        parsed_data = parse_line(data_type[1])
                     except Exception as e:
                         self.write_log(f"Error parsing data: {str(e)}")
                         return
                     self.write_log(f"{data_type[1].strip()}")
-                    self.dashboard.update_data(parsed_data)
-                    self.stats.update_stats(parsed_data, napomenutiF, napomenutiV)
+                    self.history.append(parsed_data)
+                    self.dashboard.draw()
+                    self.stats.update_stats(napomenutiF, napomenutiV)
                     self.err_status.update_status(parsed_data, nodata)
                 #self.update_css(parsed_data)
                 elif data_type[0] == "info":
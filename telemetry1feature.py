@@ -4,11 +4,13 @@ from textual.app import App, ComposeResult
 from textual.containers import Grid, Vertical
 from textual.widgets import Header, Footer, Static, RichLog, TabbedContent, TabPane, MarkdownViewer, DirectoryTree, ProgressBar, TextArea
 from textual.binding import Binding
+from textual.message import Message
 import os
 from pathlib import Path
 from typing import Iterable
 import threading
-from queue import Queue
+from collections import deque
+from queue import Empty
 import time
 import json
 import shlex
@@ -19,8 +21,21 @@ from bin.quitscreen import *
 from bin.resourcemonitor import *
 from bin.dashboard import *
 from bin.statsdashboard import *
-from bin.errorstatus import *
+from bin.errorstatusfeature import ErrorStatus
 from bin.inputscreenfeature import *
+from bin.ingest import *
+from bin.serialreader import AsyncSerialReader
+from bin.logwriter import open_log_writer, stop_process, TimestampCache
+from bin.telemetryparser import parse_line
+from bin.sessionstore import SessionRecorder, create_session_dir
+from bin.framescheduler import FrameScheduler
+from bin.logview import SessionLogView
+from bin.timeseries import TimeSeriesStore
+from bin.energy import BATTERY_MESSAGE, STICK_MESSAGE, EnergyAccount
+from bin.depletion import DepletionForecast, Z_95
+from bin.strategy import PAUSE_MESSAGE, RESUME_MESSAGE, Profile, SwapPlanner
+from bin.telemetryparser import iter_log_lines
+from bin.plotclient import PlotClient
 
 di = 0
 tim = 0
@@ -43,9 +58,21 @@ with open(f"./logs/appdatalog{x}_{k}.txt", "a") as f:
     f.write(f"--- New session started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
 
 
-def get_data(data):
-    data = dict(p.split(":") for p in data.split())
-    return data
+RESTORE_MESSAGE = "Race restored from "
+
+session_log = open_log_writer(f"./logs/appdatalog{x}_{k}.txt")
+timestamps = TimestampCache()
+log_lock = threading.Lock()
+
+def append_session_log(data):
+    """Append a line with line number and time to the session log, returns the line"""
+    global lineno
+    timestamp = timestamps.now()
+    with log_lock:
+        lineno += 1
+        line = f"{str(lineno).zfill(5)} {timestamp} | {data}"
+        session_log.write(line)
+    return line
 
 def load_race_config():
     """Load race configuration from file"""
@@ -56,7 +83,12 @@ def load_race_config():
         "battery_count": 2,
         "race_name": "Hydrogen Race",
         "enable_alerts": True,
-        "alert_threshold_percent": 10
+        "alert_threshold_percent": 10,
+        "stick_empty_vfc": 8.0,
+        "stick_empty_pfc": 0,
+        "battery_empty_vbat": 8.0,
+        "strategy_logs": [],
+        "strategy_dry_weight": 10.0
     }
     
     if config_path.exists():
@@ -72,6 +104,45 @@ def load_race_config():
     
     return default_config
 
+def load_app_config(warnings=None):
+    """Load app configuration from file, messages about bad values are appended to warnings"""
+    config_path = Path("config/app_config.json")
+    default_config = {
+        "ingest_mode": "event",
+        "poll_interval": 1.0,
+        "drain_budget": 500,
+        "queue_size": 10000,
+        "queue_policy": "coalesce",
+        "render_fps": 10,
+        "log_view_lines": 1000,
+        "log_view_every": 1,
+        "history_mb": 32,
+        "stats_windows": [30, 300],
+        "record_session": True
+    }
+    
+    if config_path.exists():
+        try:
+            with open(config_path, 'r') as f:
+                config = {**default_config, **json.load(f)}
+        except Exception:
+            pass
+        else:
+            if config["queue_policy"] not in QUEUE_POLICIES:
+                if warnings is not None:
+                    warnings.append(f"Unknown queue_policy {config['queue_policy']!r} in {config_path}, "
+                                    f"using \"coalesce\" (one of: {', '.join(QUEUE_POLICIES)})")
+                config["queue_policy"] = "coalesce"
+            return config
+    
+    with open(config_path, 'w') as f:
+        json.dump(default_config, f, indent=2)
+    
+    return default_config
+
+class DataAvailable(Message):
+    """Posted by the reader thread when new lines are waiting in the queue"""
+
 class RaceTracker(Static):
     """Widget to track race progress and component changes"""
     
@@ -98,6 +169,17 @@ class RaceTracker(Static):
         # Current expected intervals (recalculated after each change)
         self.current_stick_interval = self.stick_interval
         self.current_battery_interval = self.battery_interval
+        
+        # Energy per stick / battery stint from the telemetry
+        self.energy = EnergyAccount()
+        # Time to empty from the Vfc / Pfc / Vbat trend of the current stints
+        self.forecast = DepletionForecast(self.config)
+        
+        # Swap schedule of the remaining stints, replanned after every change
+        self.planner = SwapPlanner(self.config)
+        self.stick_plan = None
+        self.battery_plan = None
+        self.replan()
     
     def compose(self) -> ComposeResult:
         with Vertical():
@@ -108,29 +190,64 @@ class RaceTracker(Static):
             yield Static("[bold]Battery Progress:[/bold]", id="battery_label")
             yield ProgressBar(total=100, show_eta=False, id="battery_progress")
             yield Static(id="battery_info")
+            yield Static(id="energy_info")
     
     def on_mount(self):
         self.update_display()
     
     def reload_race_config(self):
         self.config = load_race_config()
+        self.forecast.set_config(self.config)
+        self.planner.set_config(self.config)
         # Recalculate base intervals
         self.stick_interval = self.config["race_duration_seconds"] / self.config["hydrogen_stick_count"]
         self.battery_interval = self.config["race_duration_seconds"] / self.config["battery_count"]
         
-        # If racing, recalculate current intervals based on remaining items
-        if self.is_racing and not self.is_paused:
-            sticks_remaining = self.config["hydrogen_stick_count"] - self.stick_changes
-            batteries_remaining = self.config["battery_count"] - self.battery_changes
-            time_remaining = self.config["race_duration_seconds"] - self.elapsed_time
-            
-            if sticks_remaining > 0:
-                self.current_stick_interval = time_remaining / sticks_remaining
-            if batteries_remaining > 0:
-                self.current_battery_interval = time_remaining / batteries_remaining
-        else:
-            self.current_stick_interval = self.stick_interval
-            self.current_battery_interval = self.battery_interval
+        # Plan the remaining items from the start of the current stints
+        self.replan()
+
+    def current_profile(self, prediction):
+        """Lifetime of the current stint from the data-driven forecast, None without one"""
+        if prediction is None:
+            return None
+        estimate, earliest, latest = prediction
+        spread = (latest - earliest) / (2 * Z_95) if latest is not None else (estimate - earliest) / Z_95
+        return Profile(estimate, spread)
+
+    def replan(self, use_forecast=False):
+        """Plan the remaining stints, the current intervals come from the plan
+
+        With use_forecast the current stints use the time to empty predicted
+        from the data instead of the measured profiles.
+        """
+        stick_current = battery_current = None
+        if use_forecast and self.is_racing:
+            stick_current = self.current_profile(self.forecast.stick_time_left())
+            if stick_current is not None:
+                stick_current.mean += self.elapsed_time - self.last_stick_change_time
+            battery_current = self.current_profile(self.forecast.battery_time_left())
+            if battery_current is not None:
+                battery_current.mean += self.elapsed_time - self.last_battery_change_time
+        self.stick_plan = self.planner.replan("stick", self.stick_changes, self.last_stick_change_time, stick_current)
+        self.battery_plan = self.planner.replan("battery", self.battery_changes, self.last_battery_change_time, battery_current)
+        if self.stick_plan:
+            self.current_stick_interval = self.stick_plan.durations[0]
+        if self.battery_plan:
+            self.current_battery_interval = self.battery_plan.durations[0]
+
+    def plan_text(self):
+        """The planned swap times for the log"""
+        lines = []
+        for name, plan, kind in (("Stick", self.stick_plan, "stick"), ("Battery", self.battery_plan, "battery")):
+            if plan is None:
+                lines.append(f"{name} plan: nothing left to plan")
+                continue
+            swaps = ", ".join(self.format_time(t) for t in plan.swap_times()) or "no more swaps"
+            lines.append(
+                f"{name} plan ({self.planner.measured[kind]} measured stints, {plan.seconds * 1000:.0f} ms): "
+                f"swaps at {swaps} | expected waste {self.format_time(plan.waste)}, dry {self.format_time(plan.dry)}"
+            )
+        return lines
 
     def start_race(self):
         """Start the race from the beginning"""
@@ -146,6 +263,9 @@ class RaceTracker(Static):
         self.last_battery_change_time = 0
         self.current_stick_interval = self.stick_interval
         self.current_battery_interval = self.battery_interval
+        self.energy.reset()
+        self.forecast.reset()
+        self.replan()
     
     def pause_race(self):
         """Pause the race"""
@@ -180,7 +300,91 @@ class RaceTracker(Static):
         self.last_battery_change_time = 0
         self.current_stick_interval = self.stick_interval
         self.current_battery_interval = self.battery_interval
+        self.energy.reset()
+        self.forecast.reset()
+        self.replan()
+        self.update_display()
+    
+    def restore_from_log(self, path):
+        """Continue the race of an app log after a restart, returns False if no race was running
+
+        The race start, pauses and changes are replayed from the messages of
+        the log (and of the logs it was restored from) and the samples go into
+        the energy account and the forecast, so the race goes on as if the
+        app had not been closed. The time it was closed counts as race time.
+        """
+        state = {"started": None, "paused_at": None, "pauses": 0.0, "sticks": 0, "batteries": 0,
+                 "last_stick": 0.0, "last_battery": 0.0}
+        energy = EnergyAccount()
+        forecast = DepletionForecast(self.config)
+        self.replay_race_log(path, state, energy, forecast)
+        if state["started"] is None:
+            return False
+
+        self.race_start_time = state["started"]
+        self.is_racing = True
+        self.is_paused = state["paused_at"] is not None
+        self.pause_start_time = state["paused_at"]
+        self.total_pause_duration = state["pauses"]
+        self.stick_changes = state["sticks"]
+        self.battery_changes = state["batteries"]
+        self.last_stick_change_time = state["last_stick"]
+        self.last_battery_change_time = state["last_battery"]
+        self.energy = energy
+        self.forecast = forecast
+        self.elapsed_time = (state["paused_at"] or time.time()) - self.race_start_time - self.total_pause_duration
+        self.replan()
         self.update_display()
+        return True
+
+    def replay_race_log(self, path, state, energy, forecast, depth=0):
+        """Replay the race messages and samples of one app log into state / energy / forecast"""
+        for host_time, text in iter_log_lines(path):
+            text = text.strip()
+            if text.startswith(RESTORE_MESSAGE) and depth < 10:
+                previous = text[len(RESTORE_MESSAGE):]
+                if os.path.exists(previous):
+                    self.replay_race_log(previous, state, energy, forecast, depth + 1)
+                continue
+            if host_time is None:
+                continue
+            elapsed = host_time - (state["started"] or host_time) - state["pauses"]
+            if text == "Race started":
+                state.update(started=host_time, paused_at=None, pauses=0.0, sticks=0, batteries=0,
+                             last_stick=0.0, last_battery=0.0)
+                energy.reset()
+                forecast.reset()
+            elif text == "Race reset":
+                state.update(started=None, paused_at=None, pauses=0.0)
+                energy.reset()
+                forecast.reset()
+            elif text == PAUSE_MESSAGE and state["started"] is not None:
+                state["paused_at"] = host_time
+            elif text == RESUME_MESSAGE and state["paused_at"] is not None:
+                state["pauses"] += host_time - state["paused_at"]
+                state["paused_at"] = None
+            elif text == STICK_MESSAGE:
+                state["sticks"] += 1
+                state["last_stick"] = elapsed
+                energy.new_stick()
+                forecast.new_stick()
+            elif text == BATTERY_MESSAGE:
+                state["batteries"] += 1
+                state["last_battery"] = elapsed
+                energy.new_battery()
+                forecast.new_battery()
+            else:
+                try:
+                    sample = parse_line(text)
+                except ValueError:
+                    continue
+                energy.add_sample(sample, host_time)
+                forecast.add_sample(sample, host_time)
+
+    def add_sample(self, data, host_time=None):
+        """Add a sample to the energy of the current stints, shown by the next update_display()"""
+        self.energy.add_sample(data, host_time)
+        self.forecast.add_sample(data, host_time)
     
     def log_stick_change(self):
         if not self.is_racing or self.is_paused:
@@ -192,12 +396,11 @@ class RaceTracker(Static):
         
         self.stick_changes += 1
         self.last_stick_change_time = self.elapsed_time
+        self.energy.new_stick()
+        self.forecast.new_stick()
         
-        # Recalculate interval: distribute remaining time evenly among remaining sticks
-        sticks_remaining = self.config["hydrogen_stick_count"] - self.stick_changes
-        if sticks_remaining > 0:
-            time_remaining = self.config["race_duration_seconds"] - self.elapsed_time
-            self.current_stick_interval = time_remaining / sticks_remaining
+        # Plan the remaining sticks again from now
+        self.replan()
         
         self.update_display()
         return 0
@@ -212,12 +415,11 @@ class RaceTracker(Static):
         
         self.battery_changes += 1
         self.last_battery_change_time = self.elapsed_time
+        self.energy.new_battery()
+        self.forecast.new_battery()
         
-        # Recalculate interval: distribute remaining time evenly among remaining batteries
-        batteries_remaining = self.config["battery_count"] - self.battery_changes
-        if batteries_remaining > 0:
-            time_remaining = self.config["race_duration_seconds"] - self.elapsed_time
-            self.current_battery_interval = time_remaining / batteries_remaining
+        # Plan the remaining batteries again from now
+        self.replan()
         
         self.update_display()
         return 0
@@ -235,8 +437,38 @@ class RaceTracker(Static):
         secs = int(seconds % 60)
         return f"{hours:02d}:{minutes:02d}:{secs:02d}"
     
+    def format_prediction(self, prediction):
+        """Time to empty from the data, with the 95% range"""
+        if prediction is None:
+            return "[dim]-- (no falling trend yet)[/dim]"
+        estimate, earliest, latest = prediction
+        latest_text = self.format_time(latest) if latest is not None else "?"
+        return f"{self.format_time(estimate)} ({self.format_time(earliest)} - {latest_text})"
+    
+    def energy_text(self):
+        """Energy of the current stints and of the previous sticks"""
+        def rate(integrator):
+            watts = integrator.watts
+            return "--" if watts is None else f"{watts:.1f} W"
+
+        stick = self.energy.stick
+        output, battery = self.energy.battery
+        lines = [
+            "[bold]Energy:[/bold]",
+            f"Stick {len(self.energy.stick_stints)}: {stick.wh:.2f} Wh, burn rate {rate(stick)}",
+            f"Battery {len(self.energy.battery_stints)}: {battery.wh:.2f} Wh from battery ({rate(battery)}), "
+            f"{output.wh:.2f} Wh output ({rate(output)})",
+        ]
+        previous = self.energy.stick_stints[:-1]
+        if previous:
+            per_stick = ", ".join(f"{stint.wh:.1f}" for stint in previous[-6:])
+            more = "..., " if len(previous) > 6 else ""
+            lines.append(f"Previous sticks: {more}{per_stick} Wh (fuel cell total {self.energy.fuel_cell_wh():.1f} Wh)")
+        return "\n".join(lines)
+    
     def update_display(self):
         race_duration = self.config["race_duration_seconds"]
+        self.query_one("#energy_info", Static).update(self.energy_text())
         
         if self.is_racing:
             race_progress = min((self.elapsed_time / race_duration) * 100, 100)
@@ -336,19 +568,21 @@ Remaining: {self.format_time(time_remaining)} ({100-race_progress:.1f}%)
             stick_label.update(f"[bold]Hydrogen Stick:[/bold] {self.stick_changes}/{self.config['hydrogen_stick_count']} changes ({sticks_remaining} remaining)")
             
             stick_info = self.query_one("#stick_info", Static)
+            stick_predicted = f"\nPredicted from data: {self.format_prediction(self.forecast.stick_time_left())}"
             if stick_time_left > 0:
-                stick_info.update(f"Time left to estimated change: {self.format_time(stick_time_left)} ({stick_remaining_percent:.1f}% remaining){stick_status}")
+                stick_info.update(f"Time left to estimated change: {self.format_time(stick_time_left)} ({stick_remaining_percent:.1f}% remaining){stick_status}{stick_predicted}")
             else:
-                stick_info.update(f"Time in use: {self.format_time(time_since_stick)} (Expected: {self.format_time(self.current_stick_interval)}){stick_status}")
+                stick_info.update(f"Time in use: {self.format_time(time_since_stick)} (Expected: {self.format_time(self.current_stick_interval)}){stick_status}{stick_predicted}")
             
             battery_label = self.query_one("#battery_label", Static)
             battery_label.update(f"[bold]Battery:[/bold] {self.battery_changes}/{self.config['battery_count']} changes ({batteries_remaining} remaining)")
             
             battery_info = self.query_one("#battery_info", Static)
+            battery_predicted = f"\nPredicted from data: {self.format_prediction(self.forecast.battery_time_left())}"
             if battery_time_left > 0:
-                battery_info.update(f"Time left to estimated change: {self.format_time(battery_time_left)} ({battery_remaining_percent:.1f}% remaining){battery_status}")
+                battery_info.update(f"Time left to estimated change: {self.format_time(battery_time_left)} ({battery_remaining_percent:.1f}% remaining){battery_status}{battery_predicted}")
             else:
-                battery_info.update(f"Time in use: {self.format_time(time_since_battery)} (Expected: {self.format_time(self.current_battery_interval)}){battery_status}")
+                battery_info.update(f"Time in use: {self.format_time(time_since_battery)} (Expected: {self.format_time(self.current_battery_interval)}){battery_status}{battery_predicted}")
             
         else:
             race_info = self.query_one("#race_info", Static)
@@ -417,7 +651,7 @@ class DashboardLogApp(App):
         }
         ConnectionStatus {
             padding: 1 1 0 1;
-            height: 2;
+            height: 3;
             
         }
 
@@ -441,7 +675,7 @@ class DashboardLogApp(App):
 
         ResourceMonitor {
             padding: 1;
-            height: 4;
+            height: 5;
             dock: bottom;
         }
         
@@ -486,11 +720,30 @@ class DashboardLogApp(App):
         self.connection_config = None
         self.update_timer = None
         self.data_stream = None
-        self.queue = Queue()
+        self.serial_reader = None
+        self.recorder = None
+        self.config_warnings = []
+        self.app_config = load_app_config(self.config_warnings)
+        self.queue = IngestQueue(
+            maxsize=self.app_config["queue_size"],
+            policy=self.app_config["queue_policy"],
+            on_spill=self.spill_line,
+        )
+        self.spilled = deque()      # (queued_at, payload) of data lines the queue spilled
+        # host time of a sample = queued_at + clock_offset, fixed so host times follow arrival order
+        self.clock_offset = time.time() - time.monotonic()
         self.read_thread = None
         self.stop_event = None
         self.race_timer = None
         self.current_config_file = None
+        self.ingest_stats = IngestStats()
+        self.frames = FrameScheduler(self.app_config["render_fps"])
+        # Samples of the session in memory, read by the widgets
+        self.history = TimeSeriesStore.from_budget(self.app_config["history_mb"])
+        # Plot server, replies come from its reader thread
+        self.plots = PlotClient(lambda message: self.call_from_thread(self.write_log, message))
+        # Set while a DataAvailable message is on its way, so the reader posts one per batch
+        self.wake_pending = threading.Event()
     
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
@@ -505,10 +758,10 @@ class DashboardLogApp(App):
                         self.err_status = ErrorStatus()
                         yield self.err_status
 
-                        self.dashboard = Dashboard()
+                        self.dashboard = Dashboard(self.history)
                         yield self.dashboard
 
-                        self.stats = StatsDashboard()
+                        self.stats = StatsDashboard(self.history, self.app_config["stats_windows"])
                         yield self.stats
                         
                         self.race_tracker = RaceTracker()
@@ -517,7 +770,14 @@ class DashboardLogApp(App):
                         self.resource_monitor = ResourceMonitor()
                         yield self.resource_monitor
                         
-                    self.data_log = RichLog(highlight=False, markup=True)
+                    self.data_log = SessionLogView(
+                        session_log.path,
+                        flush=session_log.flush,
+                        max_lines=self.app_config["log_view_lines"],
+                        show_every=self.app_config["log_view_every"],
+                        highlight=False,
+                        markup=True,
+                    )
                     yield self.data_log
                     
             with TabPane("Docs", id="tab_docs"):
@@ -539,6 +799,12 @@ class DashboardLogApp(App):
 
         yield Footer()
 
+    def on_mount(self):
+        self.frames.start(self)
+        for warning in self.config_warnings:
+            self.write_log(f"[WARNING] {warning}")
+        self.restore_race()
+
     def on_directory_tree_file_selected(self, event: DirectoryTree.FileSelected) -> None:
         """Called when a file is selected in the directory tree."""
         file_path = str(event.path)
@@ -567,19 +833,63 @@ class DashboardLogApp(App):
         while not stop_event.is_set():
             line = stream.readline()
             if line:
-                q.put(line.strip())
+                self.enqueue_line(line.strip())
             else:
                 time.sleep(0.05)     
 
-    def write_log(self, data):
-        # Function to write to log with line number and time
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        global lineno, x, k
-        lineno += 1
-        ln = str(lineno).zfill(5)
-        self.data_log.write(f"{ln} {timestamp} | {data}")
-        with open(f"./logs/appdatalog{x}_{k}.txt", "a") as f:
-            f.write(f"{ln} {timestamp} | {data}\n")
+    def enqueue_line(self, line):
+        """Queue a line for the UI, called from the reader thread or the serial reader"""
+        self.queue.put((time.monotonic(), line))
+        # Wake the UI right away instead of waiting for the next tick
+        if self.app_config["ingest_mode"] == "event" and not self.wake_pending.is_set():
+            self.wake_pending.set()
+            self.post_message(DataAvailable())
+
+    def enqueue_lines(self, lines):
+        for line in lines:
+            self.enqueue_line(line)
+
+    def on_data_available(self, message: DataAvailable):
+        # Clear first so lines queued while draining post a new wake-up
+        self.wake_pending.clear()
+        if self.is_connected:
+            self.drain_queue()
+
+    def write_log(self, data, sample=False):
+        # Function to write to log with line number and time, sample marks data lines
+        self.data_log.add_line(append_session_log(data), sample)
+
+    def spill_line(self, item):
+        """Called from the reader thread for lines the full queue will not display
+
+        They still go to the text log here and data lines to the session
+        recording and history on the UI thread, see record_spilled().
+        """
+        queued_at, data = item
+        data_type = data.split(":", 1)
+        if len(data_type) == 2 and data_type[0] in ("data", "info"):
+            append_session_log(data_type[1].strip())
+            if data_type[0] == "data":
+                self.spilled.append((queued_at, data_type[1]))
+
+    def record_spilled(self):
+        """Record the spilled samples, older than anything still in the queue"""
+        offset = self.clock_offset
+        while self.spilled:
+            queued_at, payload = self.spilled.popleft()
+            try:
+                parsed_data = parse_line(payload)
+            except ValueError:
+                self.ingest_stats.parse_errors += 1
+                continue
+            self.record_sample(parsed_data, queued_at + offset)
+
+    def record_sample(self, parsed_data, host_time):
+        """Everything that has to see every sample, shown or not"""
+        if self.recorder:
+            self.recorder.append(parsed_data, host_time)
+        self.history.append(parsed_data, host_time)
+        self.race_tracker.add_sample(parsed_data, host_time)
 
     def action_request_quit(self):
         self.push_screen(QuitScreen(), self.actually_quit)
@@ -590,7 +900,9 @@ class DashboardLogApp(App):
         else:
             self.action_disconnect()
             if self.data_stream != None:
-                self.data_stream.terminate()
+                stop_process(self.data_stream)
+            self.plots.close()
+            session_log.close()
             self.exit()
 
     def action_open_connection(self):
@@ -616,15 +928,26 @@ class DashboardLogApp(App):
             self.update_data()
             self.write_log("Disconnected")
             
+            if self.serial_reader:
+                self.serial_reader.stop()
+                self.serial_reader = None
+
             self.stop_event.set()
-            if self.read_thread.is_alive():
+            if self.read_thread and self.read_thread.is_alive():
                 self.read_thread.join(timeout=1)
 
             if self.data_stream:
-                self.data_stream.kill()
+                # a stop line lets the script flush its raw log, terminate / kill only if it hangs
+                stop_process(self.data_stream)
                 self.data_stream = None
-            while not self.queue.empty():
-                self.queue.get()
+            self.resource_monitor.watch_process(None)
+            self.queue.clear()
+            self.record_spilled()
+            if self.recorder:
+                self.recorder.close()
+                self.recorder = None
+            session_log.flush()
+            self.wake_pending.clear()
             self.stop_event.clear()
     
     def handle_connection(self, config):
@@ -639,10 +962,15 @@ class DashboardLogApp(App):
         conn_baudrate = config.get("baudrate")
         
         if conn_type == "simulated":
-            self.data_stream = subprocess.Popen(["python", "simulation_data.py"], stdout=subprocess.PIPE, text=True)
+            self.data_stream = subprocess.Popen(["python", "simulation_data.py"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
             self.start_data_stream()
         elif conn_type == "serial":
-            self.data_stream = subprocess.Popen(["python", "serialcomfeature.py", conn_port, conn_baudrate], stdout=subprocess.PIPE, text=True)
+            self.data_stream = subprocess.Popen(["python", "serialcomfeature.py", conn_port, conn_baudrate], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+            self.write_log(f"{conn_type} connection to {conn_port} @ {conn_baudrate} ")
+            self.start_data_stream()
+        elif conn_type == "serial_direct":
+            # Read the port inside the app, no serialcom subprocess
+            self.serial_reader = AsyncSerialReader(conn_port, conn_baudrate, self.enqueue_lines)
             self.write_log(f"{conn_type} connection to {conn_port} @ {conn_baudrate} ")
             self.start_data_stream()
         
@@ -692,10 +1020,17 @@ class DashboardLogApp(App):
                         self.write_log(f"unknown name {args[1]}")
                 except Exception as e:
                     self.write_log(e)
-            elif message.startswith("plot "):
+            elif message == "plan":
+                self.race_tracker.replan(use_forecast=True)
+                self.race_tracker.update_display()
+                for line in self.race_tracker.plan_text():
+                    self.write_log(line)
+            elif message == "energy" or message.startswith("energy "):
+                self.rebuild_energy(message[6:].strip())
+            elif message == "plot" or message.startswith("plot "):
                 try:
                     args = shlex.split(message[4:].strip())
-                    subprocess.Popen(["python", "plotdata.py"]+args, stdout=subprocess.PIPE, text=True)
+                    self.plots.plot(args)
                 except Exception as e:
                     self.write_log(e)
             else:
@@ -703,66 +1038,92 @@ class DashboardLogApp(App):
         else:
             return
     
+    def restore_race(self):
+        """Restarted during a race: continue it from the previous app log of today"""
+        path = f"./logs/appdatalog{x}_{k - 1}.txt"
+        if k == 0 or not os.path.exists(path):
+            return
+        try:
+            restored = self.race_tracker.restore_from_log(path)
+        except Exception as e:
+            self.write_log(f"Could not restore the race from {path}: {e}")
+            return
+        if not restored:
+            return
+        # lets the next restart find the race again
+        self.write_log(f"{RESTORE_MESSAGE}{path}")
+        tracker = self.race_tracker
+        state = "paused" if tracker.is_paused else "running"
+        self.write_log(f"Race {state} at {tracker.format_time(tracker.elapsed_time)}, "
+                       f"{tracker.stick_changes} stick and {tracker.battery_changes} battery changes")
+        if not tracker.is_paused:
+            self.race_timer = self.set_interval(0.1, self.update_race)
+
+    def rebuild_energy(self, path):
+        """Replay the stints of an app log into the race tracker, by default the previous one"""
+        if not path:
+            path = f"./logs/appdatalog{x}_{k - 1}.txt"
+        if not os.path.exists(path):
+            self.write_log(f"energy: log file not found: {path}")
+            return
+        try:
+            energy = EnergyAccount()
+            count = energy.replay_log(path)
+        except Exception as e:
+            self.write_log(f"energy: {e}")
+            return
+        self.race_tracker.energy = energy
+        self.race_tracker.update_display()
+        self.write_log(f"Energy rebuilt from {path} ({count} samples, {len(energy.stick_stints)} sticks, {len(energy.battery_stints)} batteries)")
+    
     def start_data_stream(self):
         self.is_connected = True
+        self.ingest_stats.reset()
+        self.queue.reset_counters()
         self.conn_status.update_status("Connected", self.connection_config)
         
         if self.connection_config.get("type") == "simulated":
             self.write_log("Connected successfully to stdout of simulation_data.py script")
         elif self.connection_config.get("type") == "serial":
             self.write_log("Connected successfully to stdout of serialcom.py script")
+        elif self.connection_config.get("type") == "serial_direct":
+            self.write_log("Reading serial port directly")
+        
+        if self.app_config["record_session"]:
+            self.recorder = SessionRecorder(create_session_dir())
+            self.write_log(f"Recording session to {self.recorder.path}")
         
         self.stop_event = threading.Event()
-        self.read_thread = threading.Thread(target=self.reader_thread, args=(self.data_stream.stdout, self.queue, self.stop_event), daemon=True)
-        self.read_thread.start()
+        if self.serial_reader:
+            self.serial_reader.start()
+        else:
+            self.resource_monitor.watch_process(self.data_stream.pid, os.path.basename(self.data_stream.args[1]))
+            self.read_thread = threading.Thread(target=self.reader_thread, args=(self.data_stream.stdout, self.queue, self.stop_event), daemon=True)
+            self.read_thread.start()
         
         if self.update_timer:
             self.update_timer.stop()
-        self.update_timer = self.set_interval(1, self.update_data)
+        self.update_timer = self.set_interval(self.app_config["poll_interval"], self.update_data)
     
     def update_data(self):    
-        self.resource_monitor.update_resources()
+        self.resource_monitor.update_resources(self.pipeline_stats())
         try:
             global nodata, napomenutiF, napomenutiV
 
             if not self.is_connected:
                 data = None
-                self.dashboard.update_data(None)
-                self.stats.update_stats(None, napomenutiF, napomenutiV)
-                self.err_status.update_status(None, nodata)
+                self.history.end_stream()
+                self.stats.set_warnings(napomenutiF, napomenutiV)
+                self.err_status.set_nodata(nodata)
+                self.frames.mark(self.dashboard.draw)
+                self.frames.mark(self.stats.draw)
+                self.frames.mark(self.err_status.draw)
+                return
+            
+            self.drain_queue()
+            
+            if self.data_stream is None:
                 return
-                
-            data = None
-            parsed_data = None
-    
-            while not self.queue.empty():
-                data = self.queue.get()
-                        
-                if not data:
-                    nodata += 1
-                    self.err_status.update_status(None, nodata)
-                    return
-
-                nodata = 0
-                data_type = data.split(":", 1)
-                
-                if data_type[0] == "data":
-                    try:
-                        parsed_data = get_data(data_type[1])
-                    except Exception as e:
-                        self.write_log(f"Error parsing data: {str(e)}")
-                        return
-                    self.write_log(f"{data_type[1].strip()}")
-                    self.dashboard.update_data(parsed_data)
-                    self.stats.update_stats(parsed_data, napomenutiF, napomenutiV)
-                    self.err_status.update_status(parsed_data, nodata)
-                elif data_type[0] == "info":
-                    self.write_log(f"{data_type[1].strip()}")
-                    return
-                else:
-                    self.write_log(f"Data in wrong format: {data}")
-                    return
-                    
             data_stream_status = self.data_stream.poll()
             if data_stream_status is not None:
                 self.write_log(f"Data stream status: {data_stream_status}")
@@ -770,6 +1131,95 @@ class DashboardLogApp(App):
         except Exception as e:
             self.write_log(f"Error in update_data: {str(e)}")        
             return
+    
+    def pipeline_stats(self):
+        """Queue depth, rate and log writer backlog for the resource monitor"""
+        log_backlog = session_log.backlog
+        raw_log = self.serial_reader.log_file if self.serial_reader else None
+        if raw_log:
+            log_backlog += raw_log.backlog
+        return {
+            "queue": self.queue.qsize(),
+            "lines_per_sec": self.ingest_stats.lines_per_sec if self.is_connected else 0.0,
+            "log_backlog": log_backlog,
+        }
+
+    def drain_queue(self):
+        """Process the queued lines, at most drain_budget of them per call"""
+        budget = self.app_config["drain_budget"]
+        handled = 0
+        oldest_age = 0.0
+        now = time.monotonic()
+        self.record_spilled()
+        
+        while handled < budget:
+            try:
+                queued_at, data = self.queue.get_nowait()
+            except Empty:
+                break
+            
+            if handled == 0:
+                oldest_age = now - queued_at
+            handled += 1
+            if self.spilled:
+                self.record_spilled()   # spilled while draining, older than this line
+            
+            try:
+                self.handle_line(data, queued_at)
+            except Exception as e:
+                self.ingest_stats.parse_errors += 1
+                self.write_log(f"Error in drain_queue: {str(e)}")
+        
+        backlog = self.queue.qsize()
+        self.ingest_stats.record_batch(handled, backlog, oldest_age, self.queue)
+        self.conn_status.update_ingest(self.ingest_stats)
+        self.err_status.update_loss(self.ingest_stats.dropped, self.ingest_stats.coalesced)
+        
+        # Budget used up - let the screen refresh and continue with the next batch
+        if backlog and self.app_config["ingest_mode"] == "event" and not self.wake_pending.is_set():
+            self.wake_pending.set()
+            self.post_message(DataAvailable())
+    
+    def handle_line(self, data, queued_at=None):
+        """Handle one line from the data stream, info and error lines are only logged
+
+        Samples are stamped with the time they were queued (now if not given),
+        the same clock as the spilled ones.
+        """
+        global nodata, napomenutiF, napomenutiV
+        
+        if not data:
+            nodata += 1
+            self.err_status.set_nodata(nodata)
+            self.frames.mark(self.err_status.draw)
+            return
+
+        nodata = 0
+        data_type = data.split(":", 1)
+        
+        if data_type[0] == "data":
+            try:
+                parsed_data = parse_line(data_type[1])
+            except Exception as e:
+                self.ingest_stats.parse_errors += 1
+                self.write_log(f"Error parsing data: {str(e)}")
+                return
+            self.write_log(f"{data_type[1].strip()}", sample=True)
+            # Stats and alerts see every sample, the widgets are redrawn once per frame
+            if queued_at is None:
+                queued_at = time.monotonic()
+            self.record_sample(parsed_data, queued_at + self.clock_offset)
+            self.stats.set_warnings(napomenutiF, napomenutiV)
+            self.err_status.add_sample(parsed_data)
+            self.frames.mark(self.dashboard.draw)
+            self.frames.mark(self.stats.draw)
+            self.frames.mark(self.err_status.draw)
+        elif data_type[0] == "info":
+            self.ingest_stats.info_lines += 1
+            self.write_log(f"{data_type[1].strip()}")
+        else:
+            self.ingest_stats.parse_errors += 1
+            self.write_log(f"Data in wrong format: {data}")
             
     def action_start_race(self):
         """Start or resume the race"""
@@ -851,6 +1301,10 @@ class DashboardLogApp(App):
         self.race_tracker.reload_race_config()
         self.race_tracker.update_display()
         self.write_log("Race configuration reloaded")
+        self.err_status.reload_config()
+        self.write_log(f"Error configuration reloaded, {len(self.err_status.rules)} conditions")
+        for error in self.err_status.rule_errors:
+            self.write_log(f"Ignored condition: {error}")
 
     def action_save_config(self):
         """Save the current config file - only works when text editor has focus"""